@@ -0,0 +1,259 @@
+"""
+Change-data-capture feed for customers.
+
+Every mutation in ``crud`` records a ``CustomerChange`` row in the same
+transaction, so the log never disagrees with the customers table. Consumers
+page through the log by sequence number and only pay for what changed since
+their last sync.
+
+Superseded events and old delete events are removed by the retention job:
+
+    python -m app.changelog --retention-days 7
+
+Sequence numbers follow commit order, so a consumer that has seen ``seq``
+never receives an older event later. SQLite serializes write transactions,
+which guarantees this by itself; on other databases every transaction that
+records changes first takes the row lock of the ``change_log`` counter and
+holds it until commit.
+
+After compaction the log still holds the latest event of every customer, so
+a new consumer can bootstrap by reading the feed from ``since=0``. Consumers
+that fall further behind than the retention period may miss delete events
+and should resync from scratch; ``compacted_through``, which the feed
+returns with every page, tells them when.
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.counters import add_to_counter, seed_counter
+from app.models import Customer, CustomerChange, CustomerCounter
+from app.utils.logger import setup_logger
+
+changelog_logger = setup_logger("customer-changelog", "changelog.log")
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+DEFAULT_RETENTION_DAYS = 7
+
+CHANGE_LOG_COUNTER = "change_log"
+COMPACTED_COUNTER = "change_log_compacted"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _serialize_changes(db: Session) -> None:
+    """
+    Hold the change log lock until the current transaction ends, so that
+    sequence numbers are allocated in commit order.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # Write transactions are already serialized by the database lock
+        return
+    if not add_to_counter(db, CHANGE_LOG_COUNTER, 1):
+        seed_counter(db, CHANGE_LOG_COUNTER, 0)
+        add_to_counter(db, CHANGE_LOG_COUNTER, 1)
+
+
+def record_change(db: Session, customer: Customer, operation: str) -> int:
+    """
+    Add a change event for ``customer`` to the current transaction and
+    return its sequence number. The customer must already have an ID, so
+    flush new customers first.
+    """
+    _serialize_changes(db)
+    change = CustomerChange(
+        customer_id=customer.id,
+        operation=operation,
+        changed_at=_utcnow(),
+    )
+    if operation != DELETE:
+        change.first_name = customer.first_name
+        change.last_name = customer.last_name
+        change.date_of_birth = customer.date_of_birth
+    db.add(change)
+    db.flush()
+    return change.seq
+
+
+def get_changes(db: Session, since: int = 0, limit: int = 100) -> List[CustomerChange]:
+    """
+    Retrieve change events with a sequence number greater than ``since``,
+    oldest first.
+    """
+    changelog_logger.debug(f"Retrieving changes since={since}, limit={limit}")
+    return (
+        db.query(CustomerChange)
+        .filter(CustomerChange.seq > since)
+        .order_by(CustomerChange.seq)
+        .limit(limit)
+        .all()
+    )
+
+
+class ChangeNotifier:
+    """
+    Wakes long-polling feed requests when new changes are committed.
+
+    ``notify`` may be called from any thread (CRUD operations run in the
+    threadpool); ``wait`` runs on an event loop and costs no thread or
+    database connection while it is waiting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest_seq = 0
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def latest_seq(self) -> int:
+        return self._latest_seq
+
+    def notify(self, seq: Optional[int] = None) -> None:
+        """
+        Wake all waiters. ``seq`` is the latest committed sequence number, if
+        known; notifications without one (e.g. from another process) simply
+        make waiters re-check the database.
+        """
+        with self._lock:
+            if seq is not None:
+                self._latest_seq = max(self._latest_seq, seq)
+            waiters = list(self._waiters)
+
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiting loop has already been closed
+                pass
+
+    async def wait(self, since: int, timeout: float) -> bool:
+        """
+        Wait up to ``timeout`` seconds for a change newer than ``since``.
+        Returns False on timeout.
+        """
+        event = asyncio.Event()
+        entry = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self._latest_seq > since:
+                return True
+            self._waiters.add(entry)
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+notifier = ChangeNotifier()
+
+
+def compacted_through(db: Session) -> int:
+    """
+    The highest sequence number of a delete event removed by compaction.
+    Consumers that last synced before it may have missed deletes and must
+    resync from scratch.
+    """
+    return (
+        db.query(CustomerCounter.value)
+        .filter(CustomerCounter.name == COMPACTED_COUNTER)
+        .scalar()
+        or 0
+    )
+
+
+def compact_changes(db: Session, retention: timedelta) -> dict:
+    """
+    Apply the retention policy to the change log and commit.
+
+    Events older than ``retention`` are removed when a later event for the
+    same customer exists, and delete events older than ``retention`` are
+    removed entirely. The last removed delete event is recorded, see
+    ``compacted_through``.
+
+    Returns:
+        dict: The number of superseded and delete events removed
+    """
+    cutoff = _utcnow() - retention
+    last_purged_delete = (
+        db.query(func.max(CustomerChange.seq))
+        .filter(
+            CustomerChange.changed_at < cutoff,
+            CustomerChange.operation == DELETE,
+        )
+        .scalar()
+    )
+    if last_purged_delete is not None:
+        seed_counter(db, COMPACTED_COUNTER, 0)
+        db.execute(
+            update(CustomerCounter)
+            .where(
+                CustomerCounter.name == COMPACTED_COUNTER,
+                CustomerCounter.value < last_purged_delete,
+            )
+            .values(value=last_purged_delete)
+        )
+
+    latest_per_customer = select(func.max(CustomerChange.seq)).group_by(
+        CustomerChange.customer_id
+    )
+
+    superseded = (
+        db.query(CustomerChange)
+        .filter(
+            CustomerChange.changed_at < cutoff,
+            CustomerChange.seq.not_in(latest_per_customer),
+        )
+        .delete(synchronize_session=False)
+    )
+    deletes = (
+        db.query(CustomerChange)
+        .filter(
+            CustomerChange.changed_at < cutoff,
+            CustomerChange.operation == DELETE,
+        )
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+
+    changelog_logger.info(
+        f"Compacted change log older than {cutoff}: removed {superseded} "
+        f"superseded and {deletes} delete events"
+    )
+    return {"superseded": superseded, "deletes": deletes}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compact the customer change log and apply retention."
+    )
+    parser.add_argument("--retention-days", type=float, default=DEFAULT_RETENTION_DAYS)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        compact_changes(db, timedelta(days=args.retention_days))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
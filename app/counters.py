@@ -0,0 +1,53 @@
+"""
+Helpers for the named counters in the ``customer_counters`` table.
+
+Counter rows are created on first use. Concurrent first users may both try
+to create the same row, so seeding inserts with the database's "ignore
+conflicts" form and never fails because the row already exists.
+"""
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import CustomerCounter
+
+
+def seed_counter(db: Session, name: str, value: int) -> None:
+    """
+    Create counter ``name`` with ``value`` in the current transaction,
+    unless it already exists.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.execute(
+            dialect_insert(CustomerCounter)
+            .values(name=name, value=value)
+            .on_conflict_do_nothing(index_elements=[CustomerCounter.name])
+        )
+        return
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(CustomerCounter).values(name=name, value=value))
+    except IntegrityError:
+        # Another transaction created the counter first
+        pass
+
+
+def add_to_counter(db: Session, name: str, delta: int) -> bool:
+    """
+    Add ``delta`` to counter ``name`` in the current transaction, holding
+    its row lock until commit. Returns False if the counter does not exist.
+    """
+    return bool(
+        db.execute(
+            update(CustomerCounter)
+            .where(CustomerCounter.name == name)
+            .values(value=CustomerCounter.value + delta)
+        ).rowcount
+    )
@@ -1,15 +1,58 @@
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
+import os
 from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, text
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from sqlalchemy.orm import Session
 
-from app.models import Customer
-from app.schemas import CustomerCreate, CustomerUpdate
+from app import changelog, dedup, snapshot
+from app.counters import add_to_counter, seed_counter
+from app.models import Customer, CustomerCounter
+from app.schemas import (
+    BatchOperation,
+    BatchOperationResult,
+    CustomerCreate,
+    CustomerResponse,
+    CustomerUpdate,
+)
+from app.utils.cache import TTLCache
 from app.utils.logger import setup_logger
 
 crud_logger = setup_logger("crud-operations", "crud.log")
 
+CUSTOMER_COUNTER = "customers"
+
+"""
+Filtered counts are memoized for COUNT_CACHE_TTL seconds. The memo is also
+cleared whenever this process commits a change.
+"""
+count_cache = TTLCache(ttl=float(os.getenv("COUNT_CACHE_TTL", 2.0)))
+
+
+def _adjust_customer_count(db: Session, delta: int) -> None:
+    """
+    Add ``delta`` to the customer counter in the current transaction.
+    """
+    if not add_to_counter(db, CUSTOMER_COUNTER, delta):
+        # Seed the counter from the table as it was before this change, then
+        # apply the change, so a concurrent seed is either kept or ignored
+        # without losing this delta
+        db.flush()
+        total = db.query(func.count(Customer.id)).scalar()
+        seed_counter(db, CUSTOMER_COUNTER, total - delta)
+        add_to_counter(db, CUSTOMER_COUNTER, delta)
+
+
+def _committed(seq: int) -> None:
+    """
+    Notify in-process readers that changes up to ``seq`` were committed.
+    """
+    changelog.notifier.notify(seq)
+    count_cache.clear()
+
 
 def get_customer(db: Session, customer_id: int):
     """
@@ -19,20 +62,33 @@ def get_customer(db: Session, customer_id: int):
     return db.query(Customer).filter(Customer.id == customer_id).first()
 
 
-def create_customer(db: Session, customer: CustomerCreate):
+def _add_customer(db: Session, customer: CustomerCreate):
     """
-    Create a new customer.
+    Add a new customer and its change event to the current transaction
+    without committing. Returns the customer and the change sequence number.
     """
-    crud_logger.debug(
-        f"Creating customer: first_name={customer.first_name}, last_name={customer.last_name}"
-    )
     new_customer = Customer(
         first_name=customer.first_name,
         last_name=customer.last_name,
         date_of_birth=customer.date_of_birth,
     )
     db.add(new_customer)
+    db.flush()
+    seq = changelog.record_change(db, new_customer, changelog.CREATE)
+    _adjust_customer_count(db, 1)
+    return new_customer, seq
+
+
+def create_customer(db: Session, customer: CustomerCreate):
+    """
+    Create a new customer.
+    """
+    crud_logger.debug(
+        f"Creating customer: first_name={customer.first_name}, last_name={customer.last_name}"
+    )
+    new_customer, seq = _add_customer(db, customer)
     db.commit()
+    _committed(seq)
     db.refresh(new_customer)
     return new_customer
 
@@ -45,11 +101,172 @@ def get_customers(db: Session, skip: int = 0, limit: int = 10):
     return db.query(Customer).offset(skip).limit(limit).all()
 
 
-def update_customer(db: Session, customer_id: int, customer: CustomerUpdate):
+SORTABLE_FIELDS = {
+    "id": Customer.id,
+    "first_name": Customer.first_name,
+    "last_name": Customer.last_name,
+    "date_of_birth": Customer.date_of_birth,
+}
+
+
+def _parse_sort(sort: Optional[str]):
     """
-    Update an existing customer.
+    Translate a sort expression such as ``last_name,first_name,-date_of_birth``
+    into ORDER BY clauses. ``id`` is always appended as a tie-breaker so that
+    pagination is stable and the composite indexes ending in ``id`` apply.
+    """
+    if not sort:
+        return [Customer.id.asc()]
+
+    clauses = []
+    fields = []
+    descending = False
+    for term in sort.split(","):
+        term = term.strip()
+        descending = term.startswith("-")
+        field = term.lstrip("+-")
+        if field not in SORTABLE_FIELDS or field in fields:
+            crud_logger.error(f"Invalid sort field: {term}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sort field '{term}'. Allowed fields: "
+                f"{', '.join(SORTABLE_FIELDS)}.",
+            )
+        fields.append(field)
+        column = SORTABLE_FIELDS[field]
+        clauses.append(column.desc() if descending else column.asc())
+
+    if fields == ["last_name"]:
+        # Break ties the way the (last_name, first_name, id) index is ordered
+        clauses.append(
+            Customer.first_name.desc() if descending else Customer.first_name.asc()
+        )
+        fields.append("first_name")
+
+    if "id" not in fields:
+        # Follow the direction of the last key so an all-descending sort can
+        # scan the index backwards
+        clauses.append(Customer.id.desc() if descending else Customer.id.asc())
+    return clauses
+
+
+def _prefix_filter(column, prefix: str):
+    """
+    Match values starting with ``prefix`` using a range comparison, which,
+    unlike LIKE, can be answered from an index in every backend.
+    """
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper_bound)
+
+
+def _parse_date(value: str, name: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        crud_logger.error(f"Invalid {name} format. Use YYYY-MM-DD.")
+        raise HTTPException(
+            status_code=400, detail="Invalid date format. Use YYYY-MM-DD."
+        )
+
+
+def build_customer_query(
+    db: Session,
+    sort: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    first_name_prefix: Optional[str] = None,
+    last_name_prefix: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """
+    Build a filtered and sorted customer query without pagination applied.
+    """
+    query = db.query(Customer)
+
+    if first_name is not None:
+        query = query.filter(Customer.first_name == first_name)
+    if last_name is not None:
+        query = query.filter(Customer.last_name == last_name)
+    if first_name_prefix:
+        query = query.filter(_prefix_filter(Customer.first_name, first_name_prefix))
+    if last_name_prefix:
+        query = query.filter(_prefix_filter(Customer.last_name, last_name_prefix))
+
+    start_date_obj = _parse_date(start_date, "start_date") if start_date else None
+    end_date_obj = _parse_date(end_date, "end_date") if end_date else None
+    if start_date_obj and end_date_obj and start_date_obj > end_date_obj:
+        crud_logger.error("Start date must be before or equal to end date.")
+        raise HTTPException(
+            status_code=400, detail="Start date must be before or equal to end date."
+        )
+    if start_date_obj:
+        query = query.filter(Customer.date_of_birth >= start_date_obj)
+    if end_date_obj:
+        query = query.filter(Customer.date_of_birth <= end_date_obj)
+
+    return query.order_by(*_parse_sort(sort))
+
+
+def search_customers(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    sort: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    first_name_prefix: Optional[str] = None,
+    last_name_prefix: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> List[Customer]:
+    """
+    Retrieve a sorted, filtered and paginated list of customers.
+
+    Args:
+        db (Session): Database session
+        skip (int): Number of records to skip
+        limit (int): Maximum number of records to return
+        sort (str): Comma separated fields, prefixed with '-' for descending
+        first_name (str): Exact first name to match
+        last_name (str): Exact last name to match
+        first_name_prefix (str): First name prefix to match
+        last_name_prefix (str): Last name prefix to match
+        start_date (str): Earliest date of birth in YYYY-MM-DD format
+        end_date (str): Latest date of birth in YYYY-MM-DD format
+
+    Returns:
+        List[Customer]: The requested page of customers
+    """
+    crud_logger.debug(
+        f"Searching customers with sort={sort}, first_name={first_name}, "
+        f"last_name={last_name}, first_name_prefix={first_name_prefix}, "
+        f"last_name_prefix={last_name_prefix}, start_date={start_date}, "
+        f"end_date={end_date}, skip={skip}, limit={limit}"
+    )
+    try:
+        query = build_customer_query(
+            db,
+            sort=sort,
+            first_name=first_name,
+            last_name=last_name,
+            first_name_prefix=first_name_prefix,
+            last_name_prefix=last_name_prefix,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        return query.offset(skip).limit(limit).all()
+    except SQLAlchemyError as e:
+        crud_logger.exception(f"Error searching customers: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+def _modify_customer(db: Session, customer_id: int, customer: CustomerUpdate):
+    """
+    Apply an update and its change event to the current transaction without
+    committing. Nothing is modified if the update is rejected. Returns the
+    customer and the change sequence number.
     """
-    crud_logger.debug(f"Updating customer with ID {customer_id}")
     db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
     if not db_customer:
         crud_logger.error(f"Customer with ID {customer_id} not found.")
@@ -68,16 +285,27 @@ def update_customer(db: Session, customer_id: int, customer: CustomerUpdate):
     for key, value in customer_data.items():
         setattr(db_customer, key, value)
 
+    seq = changelog.record_change(db, db_customer, changelog.UPDATE)
+    return db_customer, seq
+
+
+def update_customer(db: Session, customer_id: int, customer: CustomerUpdate):
+    """
+    Update an existing customer.
+    """
+    crud_logger.debug(f"Updating customer with ID {customer_id}")
+    db_customer, seq = _modify_customer(db, customer_id, customer)
     db.commit()
+    _committed(seq)
     db.refresh(db_customer)
     return db_customer
 
 
-def delete_customer(db: Session, customer_id: int):
+def _remove_customer(db: Session, customer_id: int):
     """
-    Delete a customer by ID.
+    Delete a customer and record its change event in the current transaction
+    without committing. Returns the change sequence number.
     """
-    crud_logger.debug(f"Deleting customer with ID {customer_id}")
     db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
     if not db_customer:
         crud_logger.error(f"Customer with ID {customer_id} not found.")
@@ -85,14 +313,223 @@ def delete_customer(db: Session, customer_id: int):
             status_code=404, detail=f"Customer with ID {customer_id} not found."
         )
 
+    seq = changelog.record_change(db, db_customer, changelog.DELETE)
     db.delete(db_customer)
+    # Flush so later operations in the same transaction no longer find it
+    db.flush()
+    _adjust_customer_count(db, -1)
+    return seq
+
+
+def delete_customer(db: Session, customer_id: int):
+    """
+    Delete a customer by ID.
+    """
+    crud_logger.debug(f"Deleting customer with ID {customer_id}")
+    seq = _remove_customer(db, customer_id)
     db.commit()
+    _committed(seq)
     return True
 
-def get_customers_by_date_range(db: Session, start_date: str, end_date: str) -> List[Customer]:
+
+def _apply_operation(db: Session, operation: BatchOperation):
+    """
+    Apply one batch operation to the current transaction, reusing the
+    CustomerCreate/CustomerUpdate validation. Rejected operations raise
+    HTTPException before anything is modified.
+    Returns the customer ID, the resulting customer (None for deletes) and
+    the change sequence number.
+    """
+    if operation.op == "create":
+        if operation.id is not None:
+            raise HTTPException(
+                status_code=400, detail="Create does not accept an 'id'."
+            )
+        customer, seq = _add_customer(db, CustomerCreate.model_validate(operation.data))
+        return customer.id, customer, seq
+
+    if operation.id is None:
+        raise HTTPException(
+            status_code=400, detail=f"An 'id' is required for {operation.op}."
+        )
+    if operation.op == "update":
+        customer, seq = _modify_customer(
+            db, operation.id, CustomerUpdate.model_validate(operation.data or {})
+        )
+        return operation.id, customer, seq
+
+    return operation.id, None, _remove_customer(db, operation.id)
+
+
+def _apply_chunk(
+    db: Session, operations: List[BatchOperation], offset: int, atomic: bool
+) -> Tuple[List[BatchOperationResult], bool]:
+    """
+    Apply operations in a single transaction and commit it once.
+
+    Rejected operations are reported and skipped, unless ``atomic`` is set,
+    in which case the first rejection rolls back the whole transaction.
+    A database error always rolls back the whole transaction.
+    Returns the results and whether the transaction was committed.
+    """
+    results: List[BatchOperationResult] = []
+    last_seq = None
+    failed = False
+
+    for index, operation in enumerate(operations, start=offset):
+        result = BatchOperationResult(index=index, op=operation.op, status="ok")
+        results.append(result)
+        if failed:
+            result.status = "skipped"
+            continue
+
+        try:
+            result.customer_id, customer, seq = _apply_operation(db, operation)
+        except ValidationError as e:
+            result.status, result.status_code = "error", 422
+            result.detail = e.errors(include_url=False, include_context=False)
+            failed = atomic
+            continue
+        except HTTPException as e:
+            result.status, result.status_code = "error", e.status_code
+            result.detail = e.detail
+            failed = atomic
+            continue
+        except SQLAlchemyError as e:
+            crud_logger.exception(f"Error applying batch operation {index}: {e}")
+            result.status, result.status_code = "error", 500
+            result.detail = "Internal server error."
+            failed = True
+            continue
+
+        last_seq = seq
+        if customer is not None:
+            # Serialize now, as committing expires the loaded attributes
+            result.customer = CustomerResponse.model_validate(customer)
+
+    if failed:
+        db.rollback()
+        for result in results:
+            if result.status == "ok":
+                result.status, result.customer = "rolled_back", None
+        return results, False
+
+    db.commit()
+    if last_seq is not None:
+        _committed(last_seq)
+    return results, True
+
+
+def apply_batch(
+    db: Session,
+    operations: List[BatchOperation],
+    atomic: bool = True,
+    chunk_size: Optional[int] = None,
+) -> List[BatchOperationResult]:
+    """
+    Apply an ordered list of create, update and delete operations.
+
+    Args:
+        db (Session): Database session
+        operations (List[BatchOperation]): Operations in the order to apply them
+        atomic (bool): Roll back a transaction if any of its operations fails
+        chunk_size (int): Commit every ``chunk_size`` operations instead of
+            once for the whole batch. Once a chunk is rolled back, the
+            operations after it are skipped rather than applied out of order.
+
+    Returns:
+        List[BatchOperationResult]: One result per operation, in order
+    """
+    chunk_size = chunk_size or len(operations)
+    crud_logger.debug(
+        f"Applying batch of {len(operations)} operations: atomic={atomic}, "
+        f"chunk_size={chunk_size}"
+    )
+    results: List[BatchOperationResult] = []
+    for start in range(0, len(operations), chunk_size):
+        chunk_results, committed = _apply_chunk(
+            db, operations[start : start + chunk_size], start, atomic
+        )
+        results.extend(chunk_results)
+        if not committed:
+            break
+
+    for index in range(len(results), len(operations)):
+        results.append(
+            BatchOperationResult(index=index, op=operations[index].op, status="skipped")
+        )
+    return results
+
+
+def find_duplicate_customers(
+    db: Session,
+    threshold: float = dedup.DEFAULT_THRESHOLD,
+    limit: int = 100,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> List[dedup.DuplicateGroup]:
+    """
+    Find up to ``limit`` groups of probable duplicate customers, optionally
+    only among customers born within a date range.
+
+    Args:
+        db (Session): Database session
+        threshold (float): Minimum name similarity between 0 and 1
+        limit (int): Maximum number of groups to return
+        start_date (str): Start date in YYYY-MM-DD format (optional)
+        end_date (str): End date in YYYY-MM-DD format (optional)
+
+    Returns:
+        List[DuplicateGroup]: Duplicate groups in date of birth order
+    """
+    crud_logger.debug(
+        f"Finding duplicate customers: threshold={threshold}, limit={limit}, "
+        f"start_date={start_date}, end_date={end_date}"
+    )
+    if start_date and end_date:
+        start_date_obj, end_date_obj = _parse_date_range(start_date, end_date)
+    else:
+        start_date_obj = _parse_date(start_date, "start_date") if start_date else None
+        end_date_obj = _parse_date(end_date, "end_date") if end_date else None
+
+    groups = []
+    try:
+        for group in dedup.find_duplicates(
+            db, threshold=threshold, start_date=start_date_obj, end_date=end_date_obj
+        ):
+            groups.append(group)
+            if len(groups) >= limit:
+                break
+    except SQLAlchemyError as e:
+        crud_logger.exception(f"Error finding duplicate customers: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+    return groups
+
+
+def _parse_date_range(start_date: str, end_date: str):
+    """
+    Validate a YYYY-MM-DD date range and return it as date objects.
+    """
+    start_date_obj = _parse_date(start_date, "start_date")
+    end_date_obj = _parse_date(end_date, "end_date")
+
+    # Ensure start date is before or equal to end date
+    if start_date_obj > end_date_obj:
+        crud_logger.error("Start date must be before or equal to end date.")
+        raise HTTPException(
+            status_code=400, detail="Start date must be before or equal to end date."
+        )
+    return start_date_obj, end_date_obj
+
+
+def get_customers_by_date_range(
+    db: Session, start_date: str, end_date: str
+) -> List[Customer]:
     """
     Retrieve customers within a specific date of birth range.
 
+    Served from the in-memory columnar snapshot when it is enabled.
+
     Args:
         db (Session): Database session
         start_date (str): Start date in YYYY-MM-DD format
@@ -102,33 +539,183 @@ def get_customers_by_date_range(db: Session, start_date: str, end_date: str) ->
         List[Customer]: List of customers within the specified date of birth range
     """
     try:
-        crud_logger.debug(f"Retrieving customers with date of birth from {start_date} to {end_date}")
-        
-        # Validate date formats
-        try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-            crud_logger.info(start_date_obj,end_date_obj)
-        except ValueError:
-            crud_logger.error("Invalid date format. Use YYYY-MM-DD.")
-            raise HTTPException(
-                status_code=400, detail="Invalid date format. Use YYYY-MM-DD."
-            )
+        crud_logger.debug(
+            f"Retrieving customers with date of birth from {start_date} to {end_date}"
+        )
+        start_date_obj, end_date_obj = _parse_date_range(start_date, end_date)
 
-        # Ensure start date is before or equal to end date
-        if start_date_obj > end_date_obj:
-            crud_logger.error("Start date must be before or equal to end date.")
-            raise HTTPException(
-                status_code=400, detail="Start date must be before or equal to end date."
+        if snapshot.customer_snapshot is not None:
+            return snapshot.customer_snapshot.customers_by_date_range(
+                db, start_date_obj, end_date_obj
             )
 
         # Query customers by date of birth range
         customers = (
             db.query(Customer)
-            .filter(Customer.date_of_birth >= start_date_obj, Customer.date_of_birth <= end_date_obj)
+            .filter(
+                Customer.date_of_birth >= start_date_obj,
+                Customer.date_of_birth <= end_date_obj,
+            )
             .all()
         )
         return customers
     except SQLAlchemyError as e:
         crud_logger.exception(f"Error retrieving customers by date of birth range: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+def count_customers_by_date_range(db: Session, start_date: str, end_date: str) -> int:
+    """
+    Count customers within a specific date of birth range.
+
+    Served from the in-memory columnar snapshot when it is enabled,
+    otherwise counted from the (date_of_birth, id) index.
+
+    Args:
+        db (Session): Database session
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+
+    Returns:
+        int: Number of customers within the specified date of birth range
+    """
+    try:
+        crud_logger.debug(
+            f"Counting customers with date of birth from {start_date} to {end_date}"
+        )
+        start_date_obj, end_date_obj = _parse_date_range(start_date, end_date)
+
+        if snapshot.customer_snapshot is not None:
+            return snapshot.customer_snapshot.count_by_date_range(
+                db, start_date_obj, end_date_obj
+            )
+
+        return (
+            db.query(func.count(Customer.id))
+            .filter(
+                Customer.date_of_birth >= start_date_obj,
+                Customer.date_of_birth <= end_date_obj,
+            )
+            .scalar()
+        )
+    except SQLAlchemyError as e:
+        crud_logger.exception(f"Error counting customers by date of birth range: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+def _estimate_customer_count(db: Session) -> Optional[int]:
+    """
+    Read the planner's row estimate for the customers table, or None if the
+    database has no statistics for it yet.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        has_stats = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        ).scalar()
+        if not has_stats:
+            return None
+        stat = db.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = 'customers' LIMIT 1")
+        ).scalar()
+        return int(stat.split()[0]) if stat else None
+    if dialect == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'customers'")
+        ).scalar()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        return estimate if estimate is not None and estimate >= 0 else None
+    return None
+
+
+def get_customer_count(db: Session, approximate: bool = False) -> int:
+    """
+    Count all customers.
+
+    Args:
+        db (Session): Database session
+        approximate (bool): Use the planner statistics (sqlite_stat1 or
+            pg_class.reltuples) when available instead of the exact counter
+
+    Returns:
+        int: The number of customers
+    """
+    return count_customers(db, approximate)[0]
+
+
+def count_customers(db: Session, approximate: bool = False) -> Tuple[int, bool]:
+    """
+    Count all customers, reporting whether the count is a planner estimate.
+
+    Args:
+        db (Session): Database session
+        approximate (bool): Use the planner statistics when available
+
+    Returns:
+        Tuple[int, bool]: The number of customers, and True if it is an
+        estimate rather than the exact counter
+    """
+    crud_logger.debug(f"Counting customers: approximate={approximate}")
+    try:
+        if approximate:
+            estimate = _estimate_customer_count(db)
+            if estimate is not None:
+                return estimate, True
+
+        total = (
+            db.query(CustomerCounter.value)
+            .filter(CustomerCounter.name == CUSTOMER_COUNTER)
+            .scalar()
+        )
+        if total is None:
+            # No customer has been created or deleted since the counter table
+            # was introduced; count once and seed the counter for later reads
+            total = db.query(func.count(Customer.id)).scalar()
+            seed_counter(db, CUSTOMER_COUNTER, total)
+            db.commit()
+        return total, False
+    except SQLAlchemyError as e:
+        crud_logger.exception(f"Error counting customers: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+def count_filtered_customers(
+    db: Session,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    first_name_prefix: Optional[str] = None,
+    last_name_prefix: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> int:
+    """
+    Count customers matching the listing filters, memoized for a short TTL.
+
+    Date of birth ranges are counted from the (date_of_birth, id) index or
+    the columnar snapshot; other filters use the same query as the listing.
+
+    Returns:
+        int: The number of matching customers
+    """
+    names = (first_name, last_name, first_name_prefix, last_name_prefix)
+    key = names + (start_date, end_date)
+
+    def load() -> int:
+        if start_date and end_date and all(name is None for name in names):
+            return count_customers_by_date_range(db, start_date, end_date)
+        try:
+            query = build_customer_query(
+                db,
+                first_name=first_name,
+                last_name=last_name,
+                first_name_prefix=first_name_prefix,
+                last_name_prefix=last_name_prefix,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            return query.order_by(None).with_entities(func.count(Customer.id)).scalar()
+        except SQLAlchemyError as e:
+            crud_logger.exception(f"Error counting customers: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error.")
+
+    return count_cache.get_or_load(key, load)
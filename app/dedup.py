@@ -0,0 +1,326 @@
+"""
+Probable duplicate customer detection.
+
+Customers are streamed from the database ordered by date of birth, so only
+one birth date worth of rows is held in memory at a time. Within a birth
+date, rows are grouped into blocks by the Soundex code of their last name
+and, as a second pass that tolerates last name typos, of their first name.
+Each block is scored with NumPy matrix products over character bigram sets
+instead of a pairwise Python loop, one tile of rows at a time, and only the
+pairs whose Dice similarity reaches the threshold are kept and merged into
+duplicate groups. Blocks larger than ``MAX_BLOCK_SIZE`` (e.g. a placeholder
+birth date shared by many rows) are compared within overlapping windows of
+sorted names, so memory stays bounded however skewed the data is.
+
+Run as a job with:
+
+    python -m app.dedup --threshold 0.85 [--start-date 1990-01-01 --end-date 1999-12-31]
+"""
+
+import argparse
+import json
+import sys
+import time
+import unicodedata
+from dataclasses import asdict, dataclass
+from datetime import date
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Customer
+from app.utils.logger import setup_logger
+
+dedup_logger = setup_logger("duplicate-detection", "dedup.log")
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_BATCH_SIZE = 10_000
+
+# Rows of the bigram matrix scored per matrix product, bounding the size of
+# the similarity tile to SCORE_TILE_SIZE x MAX_BLOCK_SIZE
+SCORE_TILE_SIZE = 1024
+
+# Blocks larger than this are split into overlapping windows of sorted names
+# (sorted neighbourhood), bounding the bigram matrix and the score tiles
+MAX_BLOCK_SIZE = 4096
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+@dataclass
+class DuplicateGroup:
+    """A set of customers that probably describe the same person."""
+
+    date_of_birth: date
+    customer_ids: List[int]
+    names: List[str]
+    similarity: float
+    """The lowest pairwise similarity that joined the group."""
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and drop everything except letters and digits."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(
+        ch
+        for ch in decomposed.lower()
+        if ch.isalnum() and not unicodedata.combining(ch)
+    )
+
+
+@lru_cache(maxsize=65536)
+def soundex(name: str) -> str:
+    """American Soundex code of an already normalized name."""
+    letters = [ch for ch in name if "a" <= ch <= "z"]
+    if not letters:
+        return name[:4]
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # 'h' and 'w' do not separate letters with the same code
+        if ch not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+@lru_cache(maxsize=65536)
+def _bigrams(name: str) -> Tuple[str, ...]:
+    padded = f"^{name}$"
+    return tuple({padded[i : i + 2] for i in range(len(padded) - 1)})
+
+
+def similar_pairs(
+    names: Sequence[str], threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs of names whose character bigram sets have a Dice similarity of at
+    least ``threshold``.
+
+    The binary bigram matrix is multiplied one tile of ``SCORE_TILE_SIZE``
+    rows at a time against the rows that follow the tile, and each tile is
+    thresholded as soon as it is computed, so no n x n matrix is ever held.
+
+    Returns:
+        Tuple of arrays ``(left, right, scores)`` with ``left < right``
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, name in enumerate(names):
+        for bigram in _bigrams(name):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(bigram, len(vocabulary)))
+
+    matrix = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+    matrix[rows, cols] = 1.0
+    sizes = matrix.sum(axis=1)
+
+    lefts, rights, similarities = [], [], []
+    for start in range(0, len(names), SCORE_TILE_SIZE):
+        stop = start + SCORE_TILE_SIZE
+        shared = matrix[start:stop] @ matrix[start:].T
+        scores = 2.0 * shared / (sizes[start:stop, None] + sizes[None, start:])
+        left, right = np.nonzero(scores >= threshold)
+        # Keep each unordered pair once, dropping self-pairs
+        upper = right > left
+        left, right = left[upper], right[upper]
+        lefts.append(left + start)
+        rights.append(right + start)
+        similarities.append(scores[left, right])
+
+    if not lefts:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(lefts), np.concatenate(rights), np.concatenate(similarities)
+
+
+def _windows(block: List[int], texts: Sequence[str]) -> Iterator[List[int]]:
+    """
+    Split an oversized block into windows of ``MAX_BLOCK_SIZE`` names in
+    sorted order, each overlapping the next by half, so that similar names
+    (which sort close together) are still compared.
+    """
+    if len(block) <= MAX_BLOCK_SIZE:
+        yield block
+        return
+
+    dedup_logger.warning(
+        f"Splitting a block of {len(block)} names into windows of {MAX_BLOCK_SIZE}"
+    )
+    ordered = sorted(block, key=lambda index: texts[index])
+    step = MAX_BLOCK_SIZE // 2
+    for start in range(0, len(ordered), step):
+        yield ordered[start : start + MAX_BLOCK_SIZE]
+        if start + MAX_BLOCK_SIZE >= len(ordered):
+            break
+
+
+class _DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.similarity = [1.0] * size
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int, similarity: float) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            self.similarity[root_a] = min(self.similarity[root_a], similarity)
+            return
+        self.parent[root_b] = root_a
+        self.similarity[root_a] = min(
+            self.similarity[root_a], self.similarity[root_b], similarity
+        )
+
+
+def _duplicates_for_birth_date(
+    date_of_birth: date, rows: List[Tuple[int, str, str]], threshold: float
+) -> List[DuplicateGroup]:
+    # Identical normalized names are collapsed first so that blocks full of
+    # exact repeats cost a single entry in the similarity matrix
+    name_index: Dict[Tuple[str, str], int] = {}
+    members: List[List[int]] = []
+    display: List[str] = []
+    for customer_id, first_name, last_name in rows:
+        key = (normalize_name(first_name), normalize_name(last_name))
+        index = name_index.get(key)
+        if index is None:
+            index = name_index[key] = len(members)
+            members.append([])
+            display.append(f"{first_name} {last_name}")
+        members[index].append(customer_id)
+
+    names = list(name_index)
+    texts = [f"{first_name} {last_name}" for first_name, last_name in names]
+    groups = _DisjointSet(len(names))
+
+    for blocking_field in (1, 0):
+        blocks: Dict[str, List[int]] = {}
+        for index, name in enumerate(names):
+            blocks.setdefault(soundex(name[blocking_field]), []).append(index)
+
+        for block in blocks.values():
+            if len(block) < 2:
+                continue
+            for window in _windows(block, texts):
+                left, right, scores = similar_pairs(
+                    [texts[i] for i in window], threshold
+                )
+                for i, j, score in zip(left.tolist(), right.tolist(), scores.tolist()):
+                    groups.union(window[i], window[j], score)
+
+    clusters: Dict[int, List[int]] = {}
+    for index in range(len(names)):
+        clusters.setdefault(groups.find(index), []).append(index)
+
+    results = []
+    for root, indexes in clusters.items():
+        customer_ids = sorted(cid for index in indexes for cid in members[index])
+        if len(customer_ids) < 2:
+            continue
+        results.append(
+            DuplicateGroup(
+                date_of_birth=date_of_birth,
+                customer_ids=customer_ids,
+                names=[display[index] for index in indexes],
+                similarity=round(groups.similarity[root], 4),
+            )
+        )
+    return results
+
+
+def find_duplicates(
+    db: Session,
+    threshold: float = DEFAULT_THRESHOLD,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Iterator[DuplicateGroup]:
+    """
+    Stream probable duplicate groups from the customers table, optionally
+    only among customers born between ``start_date`` and ``end_date``.
+
+    Rows are fetched in batches of ``batch_size`` in ``(date_of_birth, id)``
+    index order, so only the rows of a single birth date are held at once.
+    """
+    statement = (
+        select(
+            Customer.id, Customer.first_name, Customer.last_name, Customer.date_of_birth
+        )
+        .order_by(Customer.date_of_birth, Customer.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if start_date is not None:
+        statement = statement.where(Customer.date_of_birth >= start_date)
+    if end_date is not None:
+        statement = statement.where(Customer.date_of_birth <= end_date)
+    rows = db.execute(statement)
+    for date_of_birth, same_day in groupby(rows, key=lambda row: row.date_of_birth):
+        yield from _duplicates_for_birth_date(
+            date_of_birth,
+            [(row.id, row.first_name, row.last_name) for row in same_day],
+            threshold,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Report probable duplicate customers as JSON lines."
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--start-date",
+        type=date.fromisoformat,
+        help="Only consider customers born on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--end-date",
+        type=date.fromisoformat,
+        help="Only consider customers born on or before this date (YYYY-MM-DD)",
+    )
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    start_time = time.time()
+    group_count = 0
+    db = SessionLocal()
+    try:
+        for group in find_duplicates(
+            db, args.threshold, args.batch_size, args.start_date, args.end_date
+        ):
+            group_count += 1
+            sys.stdout.write(json.dumps(asdict(group), default=str) + "\n")
+    finally:
+        db.close()
+
+    dedup_logger.info(
+        f"Found {group_count} duplicate groups in {time.time() - start_time:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
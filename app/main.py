@@ -6,9 +6,11 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from sqlalchemy import MetaData, Table
 
 from .database import Base, engine
 from .routers import customers
+from .utils.admission import admission_controller_from_env
 
 # main.py
 from .utils.logger import setup_logger
@@ -34,6 +36,30 @@ api_logger = setup_logger("fastapi-api", "api.log", level=logging.INFO)
 # Initialize database
 Base.metadata.create_all(bind=engine)
 
+# create_all() skips existing tables, so add any indexes introduced since the
+# tables were first created
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Single-column indexes replaced by the composite indexes on customers
+SUPERSEDED_INDEXES = {"ix_customers_last_name", "ix_customers_date_of_birth"}
+
+
+def drop_superseded_indexes(bind) -> None:
+    """
+    Drop indexes left behind on existing databases by older versions of the
+    models, so they no longer add to the cost of every write.
+    """
+    customers_table = Table("customers", MetaData(), autoload_with=bind)
+    for index in customers_table.indexes:
+        if index.name in SUPERSEDED_INDEXES:
+            index.drop(bind=bind)
+            api_logger.info(f"Dropped superseded index {index.name}")
+
+
+drop_superseded_indexes(engine)
+
 # Create FastAPI app
 app = FastAPI(
     title="FastAPI Customer Management API",
@@ -58,6 +84,12 @@ async def validation_exception_handler(request, exc):
     )
 
 
+# Add admission control so overload is shed with 503 instead of queueing
+# without bound behind the threadpool and the database connection pool
+if os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true":
+    app.middleware("http")(admission_controller_from_env())
+
+
 # Add logging middleware to FastAPI app
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
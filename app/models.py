@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, Integer, String
+from sqlalchemy import Column, Date, DateTime, Index, Integer, String
 
 from .database import Base
 
@@ -24,14 +24,91 @@ class Customer(Base):
     that filter or sort by first name. The field is required and cannot be null.
     """
 
-    last_name = Column(String, index=True, nullable=False)
+    last_name = Column(String, nullable=False)
     """
-    The customer's last name. Indexing this column can improve queries
-    that filter or sort by last name. The field is required and cannot be null.
+    The customer's last name. Filtering and sorting by last name is served by
+    the composite ``(last_name, first_name, id)`` index below.
+    The field is required and cannot be null.
     """
 
-    date_of_birth = Column(Date, index=True, nullable=False)
+    date_of_birth = Column(Date, nullable=False)
     """
-    The customer's date of birth. Indexing this column can improve queries
-    that filter or sort by date of birth. The field is required and cannot be null.
+    The customer's date of birth. Filtering and sorting by date of birth is
+    served by the composite ``(date_of_birth, id)`` index below.
+    The field is required and cannot be null.
+    """
+
+    __table_args__ = (
+        Index("ix_customers_last_name_first_name_id", "last_name", "first_name", "id"),
+        Index("ix_customers_date_of_birth_id", "date_of_birth", "id"),
+    )
+    """
+    Composite indexes ending in ``id`` match the ``ORDER BY ..., id`` used for
+    stable pagination, so sorted listings with a limit can walk the index
+    instead of sorting the whole table.
+    """
+
+
+class CustomerChange(Base):
+    """
+    The CustomerChange model is an append-only log of customer mutations.
+    A row is written in the same transaction as every create, update and
+    delete, so downstream consumers can sync incrementally by sequence number.
+    """
+
+    __tablename__ = "customer_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    """
+    Monotonic sequence number of the change. AUTOINCREMENT is enabled on
+    SQLite so sequence numbers are never reused after compaction.
+    """
+
+    customer_id = Column(Integer, nullable=False)
+    """
+    The ID of the customer that changed. Not a foreign key, because delete
+    events outlive the customer row.
+    """
+
+    operation = Column(String, nullable=False)
+    """
+    The kind of change: "create", "update" or "delete".
+    """
+
+    first_name = Column(String, nullable=True)
+    last_name = Column(String, nullable=True)
+    date_of_birth = Column(Date, nullable=True)
+    """
+    The state of the customer after the change. Empty for delete events.
+    """
+
+    changed_at = Column(DateTime, nullable=False)
+    """
+    UTC time the change was recorded, used by the retention job.
+    """
+
+    __table_args__ = (
+        Index("ix_customer_changes_customer_id_seq", "customer_id", "seq"),
+        Index("ix_customer_changes_changed_at", "changed_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class CustomerCounter(Base):
+    """
+    The CustomerCounter model holds named row counts that are maintained in
+    the same transaction as the mutations that change them, so totals can be
+    read with a primary key lookup instead of ``SELECT COUNT(*)``.
+    """
+
+    __tablename__ = "customer_counters"
+
+    name = Column(String, primary_key=True)
+    """
+    The name of the counter, e.g. "customers".
+    """
+
+    value = Column(Integer, nullable=False, default=0)
+    """
+    The current count.
     """
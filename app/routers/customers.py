@@ -1,9 +1,10 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from .. import changelog, crud, dedup, schemas
 from ..database import get_db
 from ..utils.logger import setup_logger
 
@@ -31,26 +32,85 @@ def create_customer(customer: schemas.CustomerCreate, db: Session = Depends(get_
     return crud.create_customer(db=db, customer=customer)
 
 
+@router.post("/batch-ops", response_model=schemas.BatchResponse)
+def batch_customer_operations(
+    batch: schemas.BatchRequest, db: Session = Depends(get_db)
+):
+    """
+    Apply an ordered list of create, update and delete operations in one
+    transaction with a single commit.
+
+    - **operations**: Up to 1000 operations, each with `op` ("create", "update"
+      or "delete"), `id` (for update and delete) and `data` (for create and update).
+    - **atomic**: Roll back the transaction if any operation fails (default: true).
+      When false, failed operations are skipped and the rest are committed.
+    - **chunk_size**: Commit every `chunk_size` operations instead of once (optional).
+      Operations after a chunk that was rolled back are skipped.
+    """
+    router_logger.debug(
+        f"Applying batch of {len(batch.operations)} operations: "
+        f"atomic={batch.atomic}, chunk_size={batch.chunk_size}"
+    )
+    results = crud.apply_batch(
+        db=db,
+        operations=batch.operations,
+        atomic=batch.atomic,
+        chunk_size=batch.chunk_size,
+    )
+    return {"results": results}
+
+
 @router.get("/", response_model=List[schemas.CustomerResponse])
 def read_customers(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
     start_date: str = None,
     end_date: str = None,
+    sort: str = None,
+    first_name: str = None,
+    last_name: str = None,
+    first_name_prefix: str = None,
+    last_name_prefix: str = None,
+    count: str = "exact",
     db: Session = Depends(get_db),
 ):
     """
     Retrieve a paginated list of customers.
 
+    The total number of matching customers is returned in the `X-Total-Count`
+    header.
+
     - **skip**: Number of records to skip for pagination (default: 0).
     - **limit**: Maximum number of records to return (default: 10).
     - **start_date**: Start of the date range (YYYY-MM-DD).
     - **end_date**: End of the date range (YYYY-MM-DD).
+    - **sort**: Comma separated sort fields, prefix with '-' for descending
+      (e.g. `last_name,first_name,-date_of_birth`).
+    - **first_name** / **last_name**: Exact name filters.
+    - **first_name_prefix** / **last_name_prefix**: Name prefix filters.
+    - **count**: `exact` (default), `approximate` to allow a planner estimate
+      for the unfiltered total, or `none` to skip the `X-Total-Count` header.
     """
-    if start_date and end_date:
-        return crud.get_customers_by_date_range(
+    if count not in ("exact", "approximate", "none"):
+        router_logger.error(f"Invalid count mode: {count}")
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid count mode. Use 'exact', 'approximate' or 'none'.",
+        )
+
+    searching = any(
+        value is not None
+        for value in (sort, first_name, last_name, first_name_prefix, last_name_prefix)
+    )
+    if start_date and end_date and not searching:
+        customers = crud.get_customers_by_date_range(
             db=db, start_date=start_date, end_date=end_date
         )
+        # The date range listing is not paginated, so the total is its length
+        if count != "none":
+            response.headers["X-Total-Count"] = str(len(customers))
+        return customers
     else:
         # Existing pagination logic
         router_logger.debug(
@@ -65,10 +125,185 @@ def read_customers(
                 detail="Invalid pagination parameters. 'skip' must be >= 0 and 'limit' must be >= 1.",
             )
 
-        customers = crud.get_customers(db=db, skip=skip, limit=limit)
+        filtered = any(
+            value is not None
+            for value in (
+                first_name,
+                last_name,
+                first_name_prefix,
+                last_name_prefix,
+                start_date,
+                end_date,
+            )
+        )
+        if searching or filtered:
+            customers = crud.search_customers(
+                db=db,
+                skip=skip,
+                limit=limit,
+                sort=sort,
+                first_name=first_name,
+                last_name=last_name,
+                first_name_prefix=first_name_prefix,
+                last_name_prefix=last_name_prefix,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        else:
+            customers = crud.get_customers(db=db, skip=skip, limit=limit)
+
+        if count == "none":
+            return customers
+        if filtered:
+            total = crud.count_filtered_customers(
+                db=db,
+                first_name=first_name,
+                last_name=last_name,
+                first_name_prefix=first_name_prefix,
+                last_name_prefix=last_name_prefix,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        else:
+            total, estimated = crud.count_customers(
+                db=db, approximate=count == "approximate"
+            )
+            if estimated:
+                response.headers["X-Total-Count-Approximate"] = "true"
+        response.headers["X-Total-Count"] = str(total)
         return customers
 
 
+@router.get("/count", response_model=schemas.CountResponse)
+def count_customers(
+    start_date: str = None,
+    end_date: str = None,
+    approximate: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Count customers, optionally only those born within a date range.
+
+    - **start_date**: Start of the date range (YYYY-MM-DD).
+    - **end_date**: End of the date range (YYYY-MM-DD).
+    - **approximate**: Allow a planner estimate for the unfiltered total (default: false).
+    """
+    router_logger.debug(f"Counting customers born from {start_date} to {end_date}")
+    if start_date or end_date:
+        total = crud.count_filtered_customers(
+            db=db, start_date=start_date, end_date=end_date
+        )
+    else:
+        total = crud.get_customer_count(db=db, approximate=approximate)
+    return {"count": total}
+
+
+@router.get("/duplicates", response_model=List[schemas.DuplicateGroupResponse])
+def read_duplicate_customers(
+    threshold: float = dedup.DEFAULT_THRESHOLD,
+    limit: int = 100,
+    start_date: str = None,
+    end_date: str = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Report groups of customers that are probably duplicates of each other.
+
+    Customers sharing a date of birth and a phonetic code of their first or
+    last name are compared by name similarity. The scan runs inside the
+    request and stops once `limit` groups are found, so without a date range
+    it may read the whole table; use `python -m app.dedup` for full runs.
+
+    - **threshold**: Minimum name similarity between 0 and 1 (default: 0.85).
+    - **limit**: Maximum number of groups to return (default: 100).
+    - **start_date**: Only consider customers born on or after this date (YYYY-MM-DD).
+    - **end_date**: Only consider customers born on or before this date (YYYY-MM-DD).
+    """
+    router_logger.debug(
+        f"Retrieving duplicate customers: threshold={threshold}, limit={limit}"
+    )
+    if not 0 < threshold <= 1 or limit < 1 or limit > 1000:
+        router_logger.error(
+            f"Invalid duplicate parameters: threshold={threshold}, limit={limit}"
+        )
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid parameters. 'threshold' must be in (0, 1] and 'limit' between 1 and 1000.",
+        )
+
+    return crud.find_duplicate_customers(
+        db=db,
+        threshold=threshold,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+@router.get("/changes", response_model=schemas.ChangeFeedResponse)
+async def read_changes(
+    request: Request,
+    since: int = 0,
+    limit: int = 100,
+    wait: float = 0,
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve customer change events in commit order, including deletes.
+
+    Pass the returned `next_since` as `since` on the next call to sync
+    incrementally. If the `since` of a consumer that has synced before is
+    below the returned `compacted_through`, delete events it had not seen
+    were purged by compaction and it should resync from `since=0`.
+
+    - **since**: Return changes with a sequence number greater than this (default: 0).
+    - **limit**: Maximum number of changes to return (default: 100).
+    - **wait**: Seconds to wait for new changes when none are available (default: 0, max: 30).
+    """
+    router_logger.debug(
+        f"Retrieving changes: since={since}, limit={limit}, wait={wait}"
+    )
+    if since < 0 or limit < 1 or limit > 1000 or not 0 <= wait <= 30:
+        router_logger.error(
+            f"Invalid change feed parameters: since={since}, limit={limit}, wait={wait}"
+        )
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid parameters. 'since' must be >= 0, 'limit' between 1 and 1000 and 'wait' between 0 and 30.",
+        )
+
+    compacted_through = await run_in_threadpool(changelog.compacted_through, db)
+    changes = await run_in_threadpool(changelog.get_changes, db, since, limit)
+    if not changes:
+        # Nothing newer survives, so skip past events removed by compaction;
+        # otherwise long-polls would wake immediately on them and find nothing
+        since = max(since, compacted_through)
+    if not changes and wait > 0:
+        # End the read transaction and give back the admission slot, so
+        # nothing but the open request is held while waiting
+        await run_in_threadpool(db.rollback)
+        slot = getattr(request.state, "admission", None)
+        if slot is not None:
+            slot.suspend()
+        woken = await changelog.notifier.wait(since, timeout=wait)
+        if slot is not None and not await slot.resume():
+            router_logger.warning("Shedding change feed request after waiting")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is overloaded. Please retry later.",
+                headers={"Retry-After": str(slot.budget.retry_after())},
+            )
+        if woken:
+            changes = await run_in_threadpool(changelog.get_changes, db, since, limit)
+
+    next_since = changes[-1].seq if changes else since
+    return {
+        "changes": changes,
+        "next_since": next_since,
+        "compacted_through": compacted_through,
+    }
+
+
 @router.get("/{customer_id}", response_model=schemas.CustomerResponse)
 def read_customer(customer_id: int, db: Session = Depends(get_db)):
     """
@@ -1,7 +1,7 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 # Base class for a customer, defining the common fields
@@ -29,3 +29,71 @@ class CustomerResponse(CustomerBase):
 
     # Configure the Pydantic model to use attributes instead of dictionary keys
     model_config = ConfigDict(from_attributes=True)
+
+
+# Response model for a group of probable duplicate customers
+class DuplicateGroupResponse(BaseModel):
+    date_of_birth: date
+    customer_ids: List[int]
+    names: List[str]
+    similarity: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Response model for a single customer change event
+class CustomerChangeResponse(BaseModel):
+    seq: int
+    customer_id: int
+    operation: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    date_of_birth: Optional[date] = None
+    changed_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Response model for a page of the change feed. Consumers whose last
+# `next_since` is below `compacted_through` may have missed purged deletes
+# and should resync from since=0
+class ChangeFeedResponse(BaseModel):
+    changes: List[CustomerChangeResponse]
+    next_since: int
+    compacted_through: int
+
+
+# Response model for customer counts
+class CountResponse(BaseModel):
+    count: int
+
+
+# A single create, update or delete in a batch request. `data` is validated
+# as CustomerCreate or CustomerUpdate when the operation is applied
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+# An ordered list of operations applied in one session
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=1000)
+    atomic: bool = True
+    chunk_size: Optional[int] = Field(default=None, gt=0)
+
+
+# Outcome of a single batch operation: "ok", "error", "rolled_back" or "skipped"
+class BatchOperationResult(BaseModel):
+    index: int
+    op: str
+    status: str
+    customer_id: Optional[int] = None
+    customer: Optional[CustomerResponse] = None
+    status_code: Optional[int] = None
+    detail: Optional[Any] = None
+
+
+# Response model for a batch request, with one result per operation
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
@@ -0,0 +1,180 @@
+"""
+Production entry point that serves the API from multiple worker processes.
+
+The parent process imports the application once (creating tables and
+indexes), warms the database engine, and then forks one uvicorn worker per
+CPU that all accept connections from a shared listening socket. Workers
+share the preloaded code and data copy-on-write, re-create their own
+database connections after the fork, and keep in-process caches coherent
+with a ``DataVersionWatcher``. The parent restarts workers that exit
+unexpectedly and forwards SIGTERM/SIGINT to them on shutdown.
+
+Run with:
+
+    python -m app.serve --workers 16 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.utils.logger import setup_logger
+
+serve_logger = setup_logger("api-server", "server.log")
+
+
+def warm_engine(engine: Engine, connections: int) -> None:
+    """
+    Open ``connections`` pooled connections and run a trivial query on each,
+    so the first requests do not pay for connecting and dialect setup.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def _bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, args: argparse.Namespace) -> None:
+    from app import changelog, crud
+    from app.database import engine
+    from app.utils.coherence import DataVersionWatcher
+
+    # Drop connections inherited from the parent without closing them, as the
+    # parent still owns them, then build this worker's own pool
+    engine.dispose(close=False)
+    warm_engine(engine, args.warm_connections)
+
+    watcher = DataVersionWatcher(engine, interval=args.coherence_interval)
+    watcher.register(changelog.notifier.notify)
+    watcher.register(crud.count_cache.clear)
+    # The columnar snapshot is deliberately not invalidated here: the watcher
+    # also sees this worker's own commits, and rebuilding the arrays on every
+    # write would bypass CUSTOMER_SNAPSHOT_MAX_STALENESS
+    watcher.start()
+
+    config = uvicorn.Config(
+        app, log_level=args.log_level, access_log=False, lifespan="on"
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _run_worker(app, sock, args)
+        except BaseException:
+            serve_logger.exception(f"Worker {os.getpid()} crashed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    serve_logger.info(f"Started worker {pid}")
+    return pid
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API with worker processes.")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WORKERS", os.cpu_count() or 1))
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--warm-connections",
+        type=int,
+        default=5,
+        help="Database connections each worker opens before accepting requests",
+    )
+    parser.add_argument(
+        "--coherence-interval",
+        type=float,
+        default=0.1,
+        help="Seconds between cross-worker cache coherence checks",
+    )
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    # Preload the application in the parent so workers share it copy-on-write
+    from app.database import engine
+    from app.main import app
+
+    warm_engine(engine, 1)
+    engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(args.host, args.port, args.backlog)
+    serve_logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers[_spawn(app, sock, args)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        started_at = workers.pop(pid, None)
+        if started_at is None or stopping:
+            continue
+
+        serve_logger.error(
+            f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}"
+        )
+        if time.monotonic() - started_at < 1:
+            # Avoid a tight restart loop when workers fail on startup
+            time.sleep(1)
+        workers[_spawn(app, sock, args)] = time.monotonic()
+
+    sock.close()
+    serve_logger.info("All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+In-memory columnar snapshot of the customers table for analytical queries.
+
+The snapshot keeps one sorted int64 key per customer,
+``date_of_birth.toordinal() << 32 | id``, plus interned first and last name
+codes aligned with it. Date of birth range counts are two ``searchsorted``
+calls, and range listings are a slice of the arrays, without hydrating ORM
+objects.
+
+The database stays the source of truth. The snapshot is loaded once and then
+refreshed incrementally from the change log (see ``app.changelog``) whenever
+it is older than ``CUSTOMER_SNAPSHOT_MAX_STALENESS`` seconds, so results are
+never more stale than that interval. If compaction has removed delete events
+the snapshot has not applied yet, it is reloaded in full instead. It is disabled unless
+``CUSTOMER_SNAPSHOT_ENABLED=true``.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.changelog import DELETE, compacted_through
+from app.models import Customer, CustomerChange
+from app.utils.logger import setup_logger
+
+snapshot_logger = setup_logger("customer-snapshot", "snapshot.log")
+
+SNAPSHOT_ENABLED = os.getenv("CUSTOMER_SNAPSHOT_ENABLED", "false").lower() == "true"
+SNAPSHOT_MAX_STALENESS = float(os.getenv("CUSTOMER_SNAPSHOT_MAX_STALENESS", 5.0))
+
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _key(date_of_birth: date, customer_id: int) -> int:
+    return (date_of_birth.toordinal() << _ID_BITS) | customer_id
+
+
+class _NamePool:
+    """
+    Append-only interning of names to int32 codes. Codes are never reused,
+    so arrays built against an older pool stay valid for readers.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+@dataclass(frozen=True)
+class _Columns:
+    """An immutable version of the snapshot arrays, sorted by ``keys``."""
+
+    keys: np.ndarray
+    first_names: np.ndarray
+    last_names: np.ndarray
+    last_seq: int
+
+
+class CustomerSnapshot:
+    """
+    Read-mostly columnar copy of the customers table.
+
+    Readers always see a consistent immutable ``_Columns`` version; refreshes
+    build a new version and swap it in. Only one thread refreshes at a time,
+    and other threads keep serving the current version meanwhile.
+    """
+
+    def __init__(self, max_staleness: float = SNAPSHOT_MAX_STALENESS):
+        self.max_staleness = max_staleness
+        self._columns: Optional[_Columns] = None
+        self._names = _NamePool()
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return 0 if self._columns is None else len(self._columns.keys)
+
+    def invalidate(self) -> None:
+        """Force the next read to refresh from the database."""
+        self._refreshed_at = 0.0
+
+    def ensure_fresh(self, db: Session) -> _Columns:
+        """Return the current columns, refreshing them if they are too stale."""
+        columns = self._columns
+        if columns is not None and not self._is_stale():
+            return columns
+
+        # Block only for the initial load; otherwise serve the current
+        # version while another thread refreshes
+        if not self._lock.acquire(blocking=columns is None):
+            return columns
+        try:
+            if self._columns is None:
+                self._load(db)
+            elif self._is_stale():
+                self._apply_changes(db)
+            return self._columns
+        finally:
+            self._lock.release()
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at > self.max_staleness
+
+    def _load(self, db: Session) -> None:
+        start_time = time.perf_counter()
+        last_seq = db.execute(select(func.max(CustomerChange.seq))).scalar() or 0
+        rows = db.execute(
+            select(
+                Customer.id,
+                Customer.first_name,
+                Customer.last_name,
+                Customer.date_of_birth,
+            )
+            .order_by(Customer.date_of_birth, Customer.id)
+            .execution_options(yield_per=10_000)
+        )
+
+        keys, first_names, last_names = [], [], []
+        intern = self._names.intern
+        for customer_id, first_name, last_name, date_of_birth in rows:
+            keys.append(_key(date_of_birth, customer_id))
+            first_names.append(intern(first_name))
+            last_names.append(intern(last_name))
+
+        self._columns = _Columns(
+            keys=np.array(keys, dtype=np.int64),
+            first_names=np.array(first_names, dtype=np.int32),
+            last_names=np.array(last_names, dtype=np.int32),
+            last_seq=last_seq,
+        )
+        self._refreshed_at = time.monotonic()
+        snapshot_logger.info(
+            f"Loaded {len(keys)} customers into the snapshot in "
+            f"{time.perf_counter() - start_time:.2f}s"
+        )
+
+    def _apply_changes(self, db: Session) -> None:
+        columns = self._columns
+        if compacted_through(db) > columns.last_seq:
+            # Delete events this snapshot has not seen were compacted away
+            snapshot_logger.warning(
+                f"Change log compacted past seq {columns.last_seq}, reloading"
+            )
+            self._load(db)
+            return
+
+        changes = db.execute(
+            select(CustomerChange)
+            .where(CustomerChange.seq > columns.last_seq)
+            .order_by(CustomerChange.seq)
+        ).scalars()
+
+        # Only the latest event per customer matters
+        latest: Dict[int, CustomerChange] = {}
+        last_seq = columns.last_seq
+        for change in changes:
+            latest[change.customer_id] = change
+            last_seq = change.seq
+
+        if latest:
+            self._columns = self._merge(columns, latest, last_seq)
+        self._refreshed_at = time.monotonic()
+
+    def _merge(
+        self, columns: _Columns, latest: Dict[int, CustomerChange], last_seq: int
+    ) -> _Columns:
+        # Drop every changed customer, then re-insert the ones that still exist
+        changed_ids = np.fromiter(latest, dtype=np.int64, count=len(latest))
+        keep = ~np.isin(columns.keys & _ID_MASK, changed_ids)
+        keys = columns.keys[keep]
+        first_names = columns.first_names[keep]
+        last_names = columns.last_names[keep]
+
+        upserts = sorted(
+            (_key(c.date_of_birth, c.customer_id), c.first_name, c.last_name)
+            for c in latest.values()
+            if c.operation != DELETE
+        )
+        if upserts:
+            new_keys = np.array([u[0] for u in upserts], dtype=np.int64)
+            positions = np.searchsorted(keys, new_keys)
+            keys = np.insert(keys, positions, new_keys)
+            first_names = np.insert(
+                first_names, positions, [self._names.intern(u[1]) for u in upserts]
+            )
+            last_names = np.insert(
+                last_names, positions, [self._names.intern(u[2]) for u in upserts]
+            )
+
+        snapshot_logger.debug(
+            f"Applied {len(latest)} customer changes to the snapshot "
+            f"up to seq {last_seq}"
+        )
+        return _Columns(keys, first_names, last_names, last_seq)
+
+    @staticmethod
+    def _range(columns: _Columns, start_date: date, end_date: date) -> slice:
+        lower = start_date.toordinal() << _ID_BITS
+        upper = (end_date.toordinal() + 1) << _ID_BITS
+        start, stop = np.searchsorted(columns.keys, [lower, upper])
+        return slice(int(start), int(stop))
+
+    def count_by_date_range(self, db: Session, start_date: date, end_date: date) -> int:
+        """Count customers born between ``start_date`` and ``end_date``."""
+        span = self._range(self.ensure_fresh(db), start_date, end_date)
+        return span.stop - span.start
+
+    def customers_by_date_range(
+        self, db: Session, start_date: date, end_date: date
+    ) -> List[dict]:
+        """
+        Customers born between ``start_date`` and ``end_date`` as dictionaries,
+        ordered by date of birth and ID.
+        """
+        columns = self.ensure_fresh(db)
+        span = self._range(columns, start_date, end_date)
+        keys = columns.keys[span]
+        names = self._names.names
+        return [
+            {
+                "id": customer_id,
+                "first_name": names[first_name],
+                "last_name": names[last_name],
+                "date_of_birth": date.fromordinal(ordinal),
+            }
+            for customer_id, ordinal, first_name, last_name in zip(
+                (keys & _ID_MASK).tolist(),
+                (keys >> _ID_BITS).tolist(),
+                columns.first_names[span].tolist(),
+                columns.last_names[span].tolist(),
+            )
+        ]
+
+
+customer_snapshot = CustomerSnapshot() if SNAPSHOT_ENABLED else None
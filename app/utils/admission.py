@@ -0,0 +1,307 @@
+# app/utils/admission.py
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Mapping, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.utils.logger import setup_logger
+
+admission_logger = setup_logger("admission-control", "admission.log")
+
+READ = "read"
+WRITE = "write"
+EXPORT = "export"
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+LISTING_PATH = "/customers/"
+
+# Listing parameters that switch a date range listing to the paginated search
+SEARCH_PARAMS = (
+    "sort",
+    "first_name",
+    "last_name",
+    "first_name_prefix",
+    "last_name_prefix",
+)
+
+
+def _is_unpaginated_listing(params: Mapping[str, str]) -> bool:
+    """
+    Whether a customer listing returns the whole date of birth range rather
+    than one page, mirroring the routing in ``read_customers``.
+    """
+    return (
+        bool(params.get("start_date"))
+        and bool(params.get("end_date"))
+        and all(params.get(name) is None for name in SEARCH_PARAMS)
+    )
+
+
+class ConcurrencyBudget:
+    """
+    A concurrency limit with a bounded wait queue for one class of routes.
+
+    The limit adapts to observed latency using AIMD: every request that
+    completes within ``target_latency`` grows the limit by ``1 / limit``
+    (roughly +1 per window of requests), and slow requests shrink it by
+    ``decrease_factor`` at most once per window. A window ends once the
+    requests in flight at the last decrease, and at least ``limit`` requests
+    in total, have completed, so one burst of slow responses costs a single
+    decrease rather than one per response. The wait queue is sized relative
+    to the current limit, so when the backend slows down both the number of
+    in-flight requests and the number of queued requests shrink together.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        queue_factor: float = 1.0,
+        max_wait: float = 1.0,
+        target_latency: float = 0.25,
+        decrease_factor: float = 0.9,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit or initial_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.queue_factor = queue_factor
+        self.max_wait = max_wait
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.rejected = 0
+        # Completions left before the next multiplicative decrease is allowed
+        self._window_remaining = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_limit(self) -> int:
+        """Maximum number of requests allowed to wait for a slot."""
+        return max(1, int(self.limit * self.queue_factor))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self) -> bool:
+        """
+        Wait for a slot. Returns False if the queue is full or the wait
+        exceeds ``max_wait``; the caller should then shed the request.
+        """
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        if len(self._waiters) >= self.queue_limit:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        if waiter.done():
+            # A slot was handed over by release()
+            return True
+
+        self._abandon(waiter)
+        self.rejected += 1
+        return False
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over after we stopped waiting; give it back
+            self.in_flight -= 1
+            self._wake()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, latency: Optional[float]) -> None:
+        """
+        Free a slot and feed the observed latency into the AIMD loop. A
+        latency of None frees the slot without adjusting the limit.
+        """
+        self.in_flight -= 1
+        if latency is None:
+            self._wake()
+            return
+        self._window_remaining -= 1
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif self._window_remaining < 0:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            self._window_remaining = max(self.in_flight, int(self.limit))
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying."""
+        return max(1, math.ceil(self.max_wait))
+
+
+class AdmissionSlot:
+    """
+    The budget slot held by an admitted request, available to handlers as
+    ``request.state.admission``.
+
+    Handlers that wait for long periods without using a thread or database
+    connection (e.g. long-polling) can ``suspend`` the slot while idle and
+    ``resume`` it before doing more work. Only the time spent holding the
+    slot is reported as the request's latency.
+    """
+
+    def __init__(self, budget: ConcurrencyBudget):
+        self.budget = budget
+        self.held = True
+        self._busy_time = 0.0
+        self._held_since = time.perf_counter()
+
+    def suspend(self) -> None:
+        """Give the slot back to the budget until ``resume`` is called."""
+        if self.held:
+            self._busy_time += time.perf_counter() - self._held_since
+            self.held = False
+            self.budget.release(None)
+
+    async def resume(self) -> bool:
+        """
+        Wait for a slot again. Returns False if the request should be shed.
+        """
+        if self.held:
+            return True
+        if not await self.budget.acquire():
+            return False
+        self.held = True
+        self._held_since = time.perf_counter()
+        return True
+
+    def finish(self) -> None:
+        if self.held:
+            self.held = False
+            self.budget.release(
+                self._busy_time + time.perf_counter() - self._held_since
+            )
+
+
+class AdmissionController:
+    """
+    Routes each request to a read, write or export budget and sheds load
+    with ``503 Service Unavailable`` once that budget's queue is full.
+
+    Writes are any mutating method. Exports are requests that can scan
+    large parts of the table: GETs against ``export_paths`` and unpaginated
+    date of birth range listings. Everything else, including paginated
+    listings, is a read. Exempt paths bypass admission control entirely.
+    """
+
+    def __init__(
+        self,
+        budgets: Dict[str, ConcurrencyBudget],
+        export_paths: Iterable[str] = ("/customers/duplicates",),
+        exempt_paths: Iterable[str] = (),
+    ):
+        self.budgets = budgets
+        self.export_paths = set(export_paths)
+        self.exempt_paths = set(exempt_paths)
+
+    def classify(
+        self, method: str, path: str, params: Optional[Mapping[str, str]] = None
+    ) -> str:
+        if method.upper() in WRITE_METHODS:
+            return WRITE
+        if path in self.export_paths:
+            return EXPORT
+        if path == LISTING_PATH and _is_unpaginated_listing(params or {}):
+            return EXPORT
+        return READ
+
+    async def __call__(self, request: Request, call_next):
+        if request.url.path in self.exempt_paths:
+            return await call_next(request)
+
+        route_class = self.classify(
+            request.method, request.url.path, request.query_params
+        )
+        budget = self.budgets[route_class]
+
+        if not await budget.acquire():
+            admission_logger.warning(
+                f"Shedding {request.method} {request.url.path}: {route_class} "
+                f"budget saturated (in_flight={budget.in_flight}, "
+                f"queued={budget.queued}, limit={budget.limit:.1f})"
+            )
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded. Please retry later."},
+                headers={"Retry-After": str(budget.retry_after())},
+            )
+
+        slot = request.state.admission = AdmissionSlot(budget)
+        try:
+            return await call_next(request)
+        finally:
+            slot.finish()
+
+
+def _env_budget(
+    name: str, limit: int, target_latency: float
+) -> Tuple[str, ConcurrencyBudget]:
+    prefix = f"ADMISSION_{name.upper()}"
+    initial = int(os.getenv(f"{prefix}_LIMIT", limit))
+    return name, ConcurrencyBudget(
+        name=name,
+        initial_limit=initial,
+        min_limit=int(os.getenv(f"{prefix}_MIN_LIMIT", 1)),
+        max_limit=int(os.getenv(f"{prefix}_MAX_LIMIT", initial)),
+        queue_factor=float(os.getenv(f"{prefix}_QUEUE_FACTOR", 2.0)),
+        max_wait=float(os.getenv(f"{prefix}_MAX_WAIT", 2.0)),
+        target_latency=float(os.getenv(f"{prefix}_TARGET_LATENCY", target_latency)),
+    )
+
+
+def admission_controller_from_env() -> AdmissionController:
+    """
+    Build an AdmissionController from ``ADMISSION_*`` environment variables.
+
+    The defaults keep the read budget below the threadpool size (40) and the
+    write budget small, since SQLite serializes writers anyway.
+    """
+    return AdmissionController(
+        dict(
+            [
+                _env_budget(READ, 32, 0.25),
+                _env_budget(WRITE, 8, 0.5),
+                _env_budget(EXPORT, 4, 1.0),
+            ]
+        )
+    )
@@ -0,0 +1,44 @@
+# app/utils/cache.py
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    A small thread-safe memo whose entries expire after ``ttl`` seconds.
+    Entries can also be dropped explicitly with ``clear`` when the data they
+    were computed from changes.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        Return the cached value for ``key``, calling ``loader`` to compute and
+        store it if it is missing or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = loader()
+        expires_at = now + self.ttl
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (expires_at, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
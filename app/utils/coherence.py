@@ -0,0 +1,102 @@
+# app/utils/coherence.py
+
+import threading
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from app.utils.logger import setup_logger
+
+coherence_logger = setup_logger("cache-coherence", "coherence.log")
+
+
+class DataVersionWatcher:
+    """
+    Detect commits made by other processes and run invalidation callbacks.
+
+    On SQLite this polls ``PRAGMA data_version`` on a dedicated connection,
+    which changes whenever any other connection commits to the database
+    file. On other databases it polls the latest change log sequence number.
+    Both are a single cheap query per interval, so every worker can keep its
+    in-process caches coherent without a message broker.
+    """
+
+    def __init__(self, engine: Engine, interval: float = 0.1):
+        self.engine = engine
+        self.interval = interval
+        self._callbacks: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._connection = None
+
+    def register(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` whenever another connection commits a change."""
+        self._callbacks.append(callback)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="data-version-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _version_reader(self) -> Callable[[], int]:
+        if self.engine.dialect.name == "sqlite":
+            # A connection outside the pool, so the version moves on every
+            # commit made through the pool as well as by other processes
+            connection = self._connection = self.engine.raw_connection()
+            connection.detach()
+
+            def read_version() -> int:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("PRAGMA data_version")
+                    return cursor.fetchone()[0]
+                finally:
+                    cursor.close()
+
+            return read_version
+
+        from app.models import CustomerChange
+
+        def read_latest_seq() -> int:
+            with self.engine.connect() as connection:
+                return (
+                    connection.execute(select(func.max(CustomerChange.seq))).scalar()
+                    or 0
+                )
+
+        return read_latest_seq
+
+    def _run(self) -> None:
+        read_version = self._version_reader()
+        try:
+            self._poll(read_version)
+        finally:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _poll(self, read_version: Callable[[], int]) -> None:
+        version = read_version()
+        while not self._stop.wait(self.interval):
+            try:
+                current = read_version()
+            except Exception as e:
+                coherence_logger.error(f"Failed to read data version: {e}")
+                continue
+            if current == version:
+                continue
+            version = current
+            for callback in self._callbacks:
+                try:
+                    callback()
+                except Exception:
+                    coherence_logger.exception("Cache invalidation callback failed")
@@ -0,0 +1,134 @@
+"""
+Measure how API throughput scales with the number of `app.serve` workers.
+
+For each worker count the script starts `python -m app.serve` against a
+fresh SQLite database, seeds it through the batch endpoint, and drives
+`GET /customers/{id}` from several client processes for a fixed duration.
+
+    python performance_tests/benchmark_workers.py --workers 1 2 4 8 16
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def _seed(base_url: str, customers: int) -> None:
+    with httpx.Client(base_url=base_url, timeout=60.0) as client:
+        for start in range(0, customers, 1000):
+            operations = [
+                {
+                    "op": "create",
+                    "data": {
+                        "first_name": f"First{i}",
+                        "last_name": f"Last{i}",
+                        "date_of_birth": f"19{50 + i % 50}-01-{10 + i % 18}",
+                    },
+                }
+                for i in range(start, min(start + 1000, customers))
+            ]
+            client.post("/customers/batch-ops", json={"operations": operations})
+
+
+def _client(base_url: str, customers: int, duration: float, results) -> None:
+    ok = errors = 0
+    deadline = time.monotonic() + duration
+    with httpx.Client(base_url=base_url, timeout=10.0) as client:
+        while time.monotonic() < deadline:
+            response = client.get(f"/customers/{random.randint(1, customers)}")
+            if response.status_code == 200:
+                ok += 1
+            else:
+                errors += 1
+    results.put((ok, errors))
+
+
+def run(workers: int, clients: int, customers: int, duration: float, port: int):
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{tmp}/benchmark.db",
+            "LOG_LEVEL": "WARNING",
+            "PYTHONPATH": str(ROOT),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.serve", "--workers", str(workers)]
+            + ["--port", str(port)],
+            cwd=tmp,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_until_ready(base_url)
+            _seed(base_url, customers)
+
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(
+                    target=_client, args=(base_url, customers, duration, results)
+                )
+                for _ in range(clients)
+            ]
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    ok = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    return ok / duration, errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=None)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'errors':>8} {'speedup':>8}")
+    for workers in args.workers:
+        clients = args.clients or max(4, workers * 4)
+        throughput, errors = run(
+            workers, clients, args.customers, args.duration, args.port
+        )
+        baseline = baseline or throughput
+        print(
+            f"{workers:>8} {throughput:>10.0f} {errors:>8} "
+            f"{throughput / baseline:>7.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
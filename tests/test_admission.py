@@ -0,0 +1,138 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.admission import (
+    EXPORT,
+    READ,
+    WRITE,
+    AdmissionController,
+    ConcurrencyBudget,
+)
+
+
+def test_budget_sheds_when_queue_is_full():
+    async def scenario():
+        budget = ConcurrencyBudget("read", initial_limit=1, queue_factor=1.0)
+        assert await budget.acquire()
+
+        # One request may queue behind the in-flight one, the next is shed
+        waiter = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        assert budget.queued == 1
+        assert not await budget.acquire()
+        assert budget.rejected == 1
+
+        # Releasing the slot hands it straight to the queued request
+        budget.release(latency=0.01)
+        assert await waiter
+        assert budget.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_budget_rejects_after_max_wait():
+    async def scenario():
+        budget = ConcurrencyBudget("write", initial_limit=1, max_wait=0.01)
+        assert await budget.acquire()
+        assert not await budget.acquire()
+        assert budget.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_budget_limit_follows_latency():
+    async def scenario():
+        budget = ConcurrencyBudget(
+            "read", initial_limit=10, min_limit=2, max_limit=20, target_latency=0.1
+        )
+        # Sustained slowness shrinks the limit once per window
+        for _ in range(100):
+            assert await budget.acquire()
+            budget.release(latency=0.5)
+        assert budget.limit < 5
+
+        for _ in range(200):
+            assert await budget.acquire()
+            budget.release(latency=0.01)
+        assert budget.limit > 10
+
+    asyncio.run(scenario())
+
+
+def test_budget_decreases_once_per_burst_of_slow_requests():
+    async def scenario():
+        budget = ConcurrencyBudget("read", initial_limit=32, target_latency=0.25)
+        for _ in range(32):
+            assert await budget.acquire()
+        for _ in range(32):
+            budget.release(latency=0.3)
+        assert budget.limit == 32 * budget.decrease_factor
+        assert budget.queue_limit == int(32 * budget.decrease_factor)
+
+    asyncio.run(scenario())
+
+
+def test_controller_classifies_routes():
+    controller = AdmissionController({})
+    assert controller.classify("POST", "/customers/") == WRITE
+    assert controller.classify("DELETE", "/customers/1") == WRITE
+    assert controller.classify("GET", "/customers/") == READ
+    assert controller.classify("GET", "/customers/", {"limit": "10"}) == READ
+    assert controller.classify("GET", "/customers/duplicates") == EXPORT
+
+    # Only the unpaginated date range listing scans like an export
+    date_range = {"start_date": "1990-01-01", "end_date": "1999-12-31"}
+    assert controller.classify("GET", "/customers/", date_range) == EXPORT
+    sorted_range = {**date_range, "sort": "last_name"}
+    assert controller.classify("GET", "/customers/", sorted_range) == READ
+    assert controller.classify("GET", "/customers/1") == READ
+    assert controller.classify("GET", "/customers/changes") == READ
+    assert not controller.exempt_paths
+
+
+def test_slot_is_given_back_while_suspended():
+    budget = ConcurrencyBudget("read", initial_limit=1)
+    controller = AdmissionController({READ: budget, WRITE: budget, EXPORT: budget})
+    app = FastAPI()
+    app.middleware("http")(controller)
+    in_flight = []
+
+    @app.get("/poll")
+    async def poll(request: Request):
+        slot = request.state.admission
+        in_flight.append(budget.in_flight)
+        slot.suspend()
+        in_flight.append(budget.in_flight)
+        assert await slot.resume()
+        in_flight.append(budget.in_flight)
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        assert client.get("/poll").status_code == 200
+    assert in_flight == [1, 0, 1]
+    assert budget.in_flight == 0
+
+
+def test_controller_returns_503_with_retry_after():
+    budget = ConcurrencyBudget("read", initial_limit=1, max_wait=3)
+    controller = AdmissionController({READ: budget, WRITE: budget, EXPORT: budget})
+    app = FastAPI()
+    app.middleware("http")(controller)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        assert client.get("/ping").status_code == 200
+
+        # Saturate the budget and fill its queue
+        loop = asyncio.new_event_loop()
+        budget.in_flight = 1
+        budget._waiters.append(loop.create_future())
+        response = client.get("/ping")
+        loop.close()
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,26 @@
+import threading
+
+from sqlalchemy import create_engine, text
+
+from app.utils.coherence import DataVersionWatcher
+
+
+def test_watcher_invalidates_on_commit_from_another_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'coherence.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+
+    changed = threading.Event()
+    watcher = DataVersionWatcher(engine, interval=0.01)
+    watcher.register(changed.set)
+    watcher.start()
+    try:
+        assert not changed.wait(0.1)
+
+        # A separate engine stands in for another worker process
+        other = create_engine(f"sqlite:///{tmp_path / 'coherence.db'}")
+        with other.begin() as connection:
+            connection.execute(text("INSERT INTO items DEFAULT VALUES"))
+        assert changed.wait(2)
+    finally:
+        watcher.stop()
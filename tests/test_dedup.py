@@ -0,0 +1,66 @@
+from datetime import date
+
+from app import dedup
+from app.dedup import _duplicates_for_birth_date, normalize_name, similar_pairs, soundex
+
+
+def test_soundex():
+    assert soundex("robert") == "R163"
+    assert soundex("rupert") == "R163"
+    assert soundex("ashcraft") == "A261"
+    assert soundex("tymczak") == "T522"
+    assert soundex("lee") == "L000"
+
+
+def test_normalize_name():
+    assert normalize_name("  O'Brien ") == "obrien"
+    assert normalize_name("Zoë") == "zoe"
+
+
+def test_similar_pairs():
+    left, right, scores = similar_pairs(
+        ["john smith", "jon smith", "mary jones", "john smith"], threshold=0.85
+    )
+    pairs = sorted(zip(left.tolist(), right.tolist()))
+    assert pairs == [(0, 1), (0, 3), (1, 3)]
+    assert all(0.85 <= score <= 1.0 for score in scores.tolist())
+
+
+def test_similar_pairs_across_tiles(monkeypatch):
+    monkeypatch.setattr(dedup, "SCORE_TILE_SIZE", 2)
+    names = ["anna lee", "mark ross", "jane doe", "anna leee", "mark rosss"]
+    left, right, _ = similar_pairs(names, threshold=0.85)
+    assert sorted(zip(left.tolist(), right.tolist())) == [(0, 3), (1, 4)]
+
+
+def test_duplicates_for_birth_date():
+    rows = [
+        (1, "John", "Smith"),
+        (2, "john", "SMITH"),
+        (3, "Jon", "Smith"),
+        (4, "Jonathan", "Smyth"),
+        (5, "Mary", "Jones"),
+        (6, "John", "Smiht"),
+    ]
+    groups = _duplicates_for_birth_date(date(1990, 1, 1), rows, threshold=0.7)
+    assert [group.customer_ids for group in groups] == [[1, 2, 3, 6]]
+    assert 0.7 <= groups[0].similarity < 1.0
+
+
+def test_oversized_blocks_are_split_into_windows(monkeypatch):
+    monkeypatch.setattr(dedup, "MAX_BLOCK_SIZE", 4)
+    first_names = [
+        "Abigail",
+        "Benedict",
+        "Cornelius",
+        "Dorothea",
+        "Evangeline",
+        "Frederick",
+        "Gwendolyn",
+        "Jonathan",
+        "Jonathon",
+        "Harriet",
+    ]
+    rows = [(i, name, "Smith") for i, name in enumerate(first_names)]
+    groups = _duplicates_for_birth_date(date(1990, 1, 1), rows, threshold=0.85)
+    assert [group.customer_ids for group in groups] == [[7, 8]]
@@ -1,11 +1,16 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app import changelog, crud, models, schemas, snapshot
 from app.database import Base, get_db
-from app.main import app
+from app.main import app, drop_superseded_indexes
 
 # Test database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -150,3 +155,598 @@ def test_get_customers_pagination(client):
     assert [customer["first_name"] for customer in data] == [
         f"Customer{i}" for i in range(5)
     ]
+
+
+def _create_customers(client, customers):
+    for first_name, last_name, date_of_birth in customers:
+        client.post(
+            "/customers/",
+            json={
+                "first_name": first_name,
+                "last_name": last_name,
+                "date_of_birth": date_of_birth,
+            },
+        )
+
+
+def test_get_customers_sorted_and_filtered(client):
+    _create_customers(
+        client,
+        [
+            ("Ann", "Smith", "1990-05-01"),
+            ("Bob", "Smith", "1985-01-01"),
+            ("Bob", "Smith", "1992-03-04"),
+            ("Cid", "Smyth", "1991-07-07"),
+            ("Dan", "Jones", "1990-01-01"),
+        ],
+    )
+
+    response = client.get("/customers/?sort=last_name,first_name,-date_of_birth")
+    assert response.status_code == 200
+    assert [
+        (c["last_name"], c["first_name"], c["date_of_birth"]) for c in response.json()
+    ] == [
+        ("Jones", "Dan", "1990-01-01"),
+        ("Smith", "Ann", "1990-05-01"),
+        ("Smith", "Bob", "1992-03-04"),
+        ("Smith", "Bob", "1985-01-01"),
+        ("Smyth", "Cid", "1991-07-07"),
+    ]
+
+    response = client.get("/customers/?last_name_prefix=Sm&sort=-date_of_birth&limit=2")
+    assert [c["first_name"] for c in response.json()] == ["Bob", "Cid"]
+
+    response = client.get(
+        "/customers/?last_name=Smith&start_date=1990-01-01&end_date=1999-12-31"
+        "&sort=date_of_birth"
+    )
+    assert [c["date_of_birth"] for c in response.json()] == [
+        "1990-05-01",
+        "1992-03-04",
+    ]
+
+
+def test_get_customers_invalid_sort(client):
+    response = client.get("/customers/?sort=middle_name")
+    assert response.status_code == 400
+
+
+def _query_plan(query):
+    compiled = query.statement.compile(dialect=engine.dialect)
+    params = [compiled.params[key] for key in compiled.positiontup]
+    params = [p.isoformat() if isinstance(p, date) else p for p in params]
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}", tuple(params)
+        )
+        return " | ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "filters, index, partial_sort",
+    [
+        (
+            {"sort": "last_name,first_name"},
+            "ix_customers_last_name_first_name_id",
+            False,
+        ),
+        ({"sort": "-last_name"}, "ix_customers_last_name_first_name_id", False),
+        (
+            {"last_name_prefix": "Sm", "sort": "last_name"},
+            "ix_customers_last_name_first_name_id",
+            False,
+        ),
+        (
+            {"last_name": "Smith", "sort": "first_name"},
+            "ix_customers_last_name_first_name_id",
+            False,
+        ),
+        (
+            {
+                "start_date": "1990-01-01",
+                "end_date": "1999-12-31",
+                "sort": "date_of_birth",
+            },
+            "ix_customers_date_of_birth_id",
+            False,
+        ),
+        # The index supplies the (last_name, first_name) order, so only rows
+        # sharing both names are sorted by date of birth
+        (
+            {"sort": "last_name,first_name,-date_of_birth"},
+            "ix_customers_last_name_first_name_id",
+            True,
+        ),
+    ],
+)
+def test_sorted_listing_uses_composite_index(test_db, filters, index, partial_sort):
+    db = TestingSessionLocal()
+    try:
+        plan = _query_plan(crud.build_customer_query(db, **filters).limit(10))
+    finally:
+        db.close()
+    assert index in plan
+    if partial_sort:
+        assert "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY" in plan
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+    else:
+        assert "TEMP B-TREE" not in plan
+
+
+def test_superseded_indexes_are_dropped(test_db):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_customers_last_name ON customers (last_name)"
+        )
+    drop_superseded_indexes(engine)
+    names = {index["name"] for index in inspect(engine).get_indexes("customers")}
+    assert "ix_customers_last_name" not in names
+    assert "ix_customers_last_name_first_name_id" in names
+
+
+def test_get_duplicate_customers(client):
+    _create_customers(
+        client,
+        [
+            ("TestFirstName1", "TestLastName1", "1960-01-15"),
+            ("TestFirstName1", "TestLastName1", "1960-01-15"),
+            ("Testfirstname1", "Test-LastName1", "1960-01-15"),
+            ("TestFirstName1", "TestLastName1", "1961-01-15"),
+            ("Jane", "Doe", "1960-01-15"),
+        ],
+    )
+
+    response = client.get("/customers/duplicates")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["customer_ids"] == [1, 2, 3]
+    assert data[0]["date_of_birth"] == "1960-01-15"
+
+    outside = client.get(
+        "/customers/duplicates?start_date=1960-02-01&end_date=1961-12-31"
+    )
+    assert outside.status_code == 200
+    assert outside.json() == []
+
+    assert client.get("/customers/duplicates?threshold=0").status_code == 400
+    assert client.get("/customers/duplicates?start_date=1960").status_code == 400
+    response = client.get(
+        "/customers/duplicates?start_date=1961-01-01&end_date=1960-01-01"
+    )
+    assert response.status_code == 400
+
+
+def test_get_changes_feed(client):
+    _create_customers(
+        client, [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")]
+    )
+    client.put("/customers/1", json={"first_name": "Anne"})
+    client.delete("/customers/2")
+
+    response = client.get("/customers/changes?since=0")
+    assert response.status_code == 200
+    data = response.json()
+    assert [(c["customer_id"], c["operation"]) for c in data["changes"]] == [
+        (1, "create"),
+        (2, "create"),
+        (1, "update"),
+        (2, "delete"),
+    ]
+    assert data["changes"][2]["first_name"] == "Anne"
+    assert data["changes"][3]["first_name"] is None
+    assert data["next_since"] == data["changes"][-1]["seq"]
+
+    response = client.get(f"/customers/changes?since={data['next_since']}")
+    assert response.json() == {
+        "changes": [],
+        "next_since": data["next_since"],
+        "compacted_through": 0,
+    }
+
+    response = client.get("/customers/changes?since=1&limit=1")
+    assert [c["seq"] for c in response.json()["changes"]] == [2]
+
+
+def test_get_changes_long_poll(client, monkeypatch):
+    # Sequence numbers restart with each test database
+    monkeypatch.setattr(changelog, "notifier", changelog.ChangeNotifier())
+    _create_customers(client, [("Ann", "Smith", "1990-05-01")])
+    since = client.get("/customers/changes").json()["next_since"]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(
+            client.get, f"/customers/changes?since={since}&wait=5"
+        )
+        time.sleep(0.2)
+        assert not pending.done()
+        _create_customers(client, [("Bob", "Jones", "1985-01-01")])
+        response = pending.result(timeout=5)
+
+    assert [c["first_name"] for c in response.json()["changes"]] == ["Bob"]
+
+    start = time.monotonic()
+    response = client.get(f"/customers/changes?since={since + 1}&wait=0.2")
+    assert response.json()["changes"] == []
+    assert time.monotonic() - start >= 0.2
+
+
+def test_changes_feed_skips_compacted_trailing_events(client, monkeypatch):
+    monkeypatch.setattr(changelog, "notifier", changelog.ChangeNotifier())
+    _create_customers(
+        client, [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")]
+    )
+    client.delete("/customers/2")
+    db = TestingSessionLocal()
+    try:
+        changelog.compact_changes(db, timedelta(0))
+    finally:
+        db.close()
+
+    # A lagging consumer learns that deletes it never saw were purged
+    assert client.get("/customers/changes?since=1").json()["compacted_through"] == 3
+
+    data = client.get("/customers/changes").json()
+    assert [c["seq"] for c in data["changes"]] == [1]
+
+    # The empty page moves past the purged events instead of returning
+    # immediately on every long-poll
+    start = time.monotonic()
+    data = client.get(f"/customers/changes?since={data['next_since']}&wait=0.3").json()
+    assert time.monotonic() - start >= 0.3
+    assert data == {"changes": [], "next_since": 3, "compacted_through": 3}
+
+
+def test_compact_changes(client):
+    _create_customers(
+        client, [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")]
+    )
+    client.put("/customers/1", json={"first_name": "Anne"})
+    client.delete("/customers/2")
+
+    db = TestingSessionLocal()
+    try:
+        assert changelog.compact_changes(db, timedelta(days=1)) == {
+            "superseded": 0,
+            "deletes": 0,
+        }
+        assert changelog.compact_changes(db, timedelta(0)) == {
+            "superseded": 2,
+            "deletes": 1,
+        }
+    finally:
+        db.close()
+
+    changes = client.get("/customers/changes").json()["changes"]
+    assert [(c["customer_id"], c["operation"]) for c in changes] == [(1, "update")]
+
+
+def test_count_customers_by_date_range(client):
+    _create_customers(
+        client,
+        [
+            ("Ann", "Smith", "1990-05-01"),
+            ("Bob", "Jones", "1985-01-01"),
+            ("Cid", "Smyth", "1991-07-07"),
+        ],
+    )
+    response = client.get("/customers/count?start_date=1990-01-01&end_date=1991-07-07")
+    assert response.status_code == 200
+    assert response.json() == {"count": 2}
+
+    response = client.get("/customers/count?start_date=1991-01-01&end_date=1990-01-01")
+    assert response.status_code == 400
+
+
+def test_date_range_served_from_snapshot(client, monkeypatch):
+    monkeypatch.setattr(
+        snapshot, "customer_snapshot", snapshot.CustomerSnapshot(max_staleness=0)
+    )
+    _create_customers(
+        client,
+        [
+            ("Ann", "Smith", "1990-05-01"),
+            ("Bob", "Jones", "1985-01-01"),
+            ("Cid", "Smyth", "1991-07-07"),
+        ],
+    )
+    url = "/customers/?start_date=1990-01-01&end_date=1995-12-31"
+    assert [c["first_name"] for c in client.get(url).json()] == ["Ann", "Cid"]
+
+    # Later changes are applied incrementally from the change log
+    client.put(
+        "/customers/2", json={"first_name": "Bobby", "date_of_birth": "1993-03-03"}
+    )
+    _create_customers(client, [("Dee", "Doe", "1990-05-01")])
+    client.delete("/customers/3")
+
+    assert client.get(url).json() == [
+        {
+            "id": 1,
+            "first_name": "Ann",
+            "last_name": "Smith",
+            "date_of_birth": "1990-05-01",
+        },
+        {
+            "id": 4,
+            "first_name": "Dee",
+            "last_name": "Doe",
+            "date_of_birth": "1990-05-01",
+        },
+        {
+            "id": 2,
+            "first_name": "Bobby",
+            "last_name": "Jones",
+            "date_of_birth": "1993-03-03",
+        },
+    ]
+    response = client.get("/customers/count?start_date=1990-05-01&end_date=1990-05-01")
+    assert response.json() == {"count": 2}
+
+
+def test_snapshot_reloads_after_compaction(client, monkeypatch):
+    monkeypatch.setattr(
+        snapshot, "customer_snapshot", snapshot.CustomerSnapshot(max_staleness=0)
+    )
+    _create_customers(
+        client, [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1990-06-01")]
+    )
+    url = "/customers/count?start_date=1990-01-01&end_date=1990-12-31"
+    assert client.get(url).json() == {"count": 2}
+
+    # The delete event is purged before the snapshot applies it
+    monkeypatch.setattr(snapshot.customer_snapshot, "max_staleness", 60)
+    client.delete("/customers/1")
+    db = TestingSessionLocal()
+    try:
+        changelog.compact_changes(db, timedelta(0))
+        assert changelog.compacted_through(db) > 0
+    finally:
+        db.close()
+
+    snapshot.customer_snapshot.invalidate()
+    crud.count_cache.clear()
+    assert client.get(url).json() == {"count": 1}
+
+
+def test_batch_operations(client):
+    _create_customers(client, [("Ann", "Smith", "1990-05-01")])
+
+    response = client.post(
+        "/customers/batch-ops",
+        json={
+            "operations": [
+                {
+                    "op": "create",
+                    "data": {
+                        "first_name": "Bob",
+                        "last_name": "Jones",
+                        "date_of_birth": "1985-01-01",
+                    },
+                },
+                {"op": "update", "id": 1, "data": {"first_name": "Anne"}},
+                {"op": "delete", "id": 2},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["op"], r["status"], r["customer_id"]) for r in results] == [
+        ("create", "ok", 2),
+        ("update", "ok", 1),
+        ("delete", "ok", 2),
+    ]
+    assert results[1]["customer"]["first_name"] == "Anne"
+
+    assert client.get("/customers/1").json()["first_name"] == "Anne"
+    assert client.get("/customers/2").status_code == 404
+    changes = client.get("/customers/changes?since=1").json()["changes"]
+    assert [c["operation"] for c in changes] == ["create", "update", "delete"]
+
+
+def test_batch_operations_repeated_ids(client):
+    _create_customers(
+        client, [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")]
+    )
+
+    response = client.post(
+        "/customers/batch-ops",
+        json={
+            "atomic": False,
+            "operations": [
+                {"op": "delete", "id": 2},
+                {"op": "delete", "id": 2},
+                {"op": "update", "id": 2, "data": {"first_name": "Bobby"}},
+            ],
+        },
+    )
+    results = response.json()["results"]
+    assert [(r["status"], r["status_code"]) for r in results] == [
+        ("ok", None),
+        ("error", 404),
+        ("error", 404),
+    ]
+    assert client.get("/customers/").headers["X-Total-Count"] == "1"
+    changes = client.get("/customers/changes?since=2").json()["changes"]
+    assert [c["operation"] for c in changes] == ["delete"]
+
+
+def test_batch_operations_atomic_rollback(client):
+    _create_customers(client, [("Ann", "Smith", "1990-05-01")])
+
+    response = client.post(
+        "/customers/batch-ops",
+        json={
+            "operations": [
+                {"op": "update", "id": 1, "data": {"first_name": "Anne"}},
+                {"op": "delete", "id": 99},
+                {"op": "delete", "id": 1},
+            ]
+        },
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["rolled_back", "error", "skipped"]
+    assert results[1]["status_code"] == 404
+    assert client.get("/customers/1").json()["first_name"] == "Ann"
+
+
+def test_batch_operations_stop_after_rolled_back_chunk(client):
+    _create_customers(client, [("Ann", "Smith", "1990-05-01")])
+
+    response = client.post(
+        "/customers/batch-ops",
+        json={
+            "chunk_size": 1,
+            "operations": [
+                {"op": "update", "id": 1, "data": {"first_name": "Anne"}},
+                {"op": "delete", "id": 99},
+                {"op": "update", "id": 1, "data": {"first_name": "Annie"}},
+                {"op": "delete", "id": 1},
+            ],
+        },
+    )
+    results = response.json()["results"]
+    assert [(r["index"], r["status"]) for r in results] == [
+        (0, "ok"),
+        (1, "error"),
+        (2, "skipped"),
+        (3, "skipped"),
+    ]
+    assert client.get("/customers/1").json()["first_name"] == "Anne"
+
+
+def test_batch_operations_non_atomic_chunks(client):
+    response = client.post(
+        "/customers/batch-ops",
+        json={
+            "atomic": False,
+            "chunk_size": 2,
+            "operations": [
+                {
+                    "op": "create",
+                    "data": {
+                        "first_name": "Ann",
+                        "last_name": "Smith",
+                        "date_of_birth": "1990-05-01",
+                    },
+                },
+                {"op": "create", "data": {"first_name": "Bob"}},
+                {"op": "update", "data": {"first_name": "Anne"}},
+                {"op": "update", "id": 1, "data": {"first_name": "Anne"}},
+            ],
+        },
+    )
+    results = response.json()["results"]
+    assert [(r["index"], r["status"], r["status_code"]) for r in results] == [
+        (0, "ok", None),
+        (1, "error", 422),
+        (2, "error", 400),
+        (3, "ok", None),
+    ]
+    assert client.get("/customers/1").json()["first_name"] == "Anne"
+
+    response = client.post("/customers/batch-ops", json={"operations": []})
+    assert response.status_code == 422
+
+
+def test_get_customers_total_count(client):
+    _create_customers(
+        client,
+        [
+            ("Ann", "Smith", "1990-05-01"),
+            ("Bob", "Jones", "1985-01-01"),
+            ("Cid", "Smyth", "1991-07-07"),
+        ],
+    )
+    client.delete("/customers/2")
+    client.post(
+        "/customers/batch-ops",
+        json={
+            "operations": [
+                {
+                    "op": "create",
+                    "data": {
+                        "first_name": "Dee",
+                        "last_name": "Smith",
+                        "date_of_birth": "1992-02-02",
+                    },
+                },
+                {"op": "delete", "id": 1},
+            ]
+        },
+    )
+
+    response = client.get("/customers/?limit=1")
+    assert len(response.json()) == 1
+    assert response.headers["X-Total-Count"] == "2"
+
+    db = TestingSessionLocal()
+    try:
+        counter = db.get(models.CustomerCounter, crud.CUSTOMER_COUNTER)
+        assert counter.value == 2
+    finally:
+        db.close()
+
+    response = client.get("/customers/?last_name_prefix=Sm&start_date=1992-01-01")
+    assert response.headers["X-Total-Count"] == "1"
+    response = client.get("/customers/?start_date=1990-01-01&end_date=1999-12-31")
+    assert response.headers["X-Total-Count"] == "2"
+    response = client.get("/customers/?count=none")
+    assert "X-Total-Count" not in response.headers
+    assert client.get("/customers/?count=maybe").status_code == 400
+
+    assert client.get("/customers/count").json() == {"count": 2}
+
+
+def test_customer_counter_is_seeded_on_first_use(client):
+    _create_customers(
+        client,
+        [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")],
+    )
+    # Simulate a table populated before the counter existed
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM customer_counters")
+
+    assert client.get("/customers/").headers["X-Total-Count"] == "2"
+    db = TestingSessionLocal()
+    try:
+        assert db.get(models.CustomerCounter, crud.CUSTOMER_COUNTER).value == 2
+
+        # Seeding again is ignored, and a writer that finds no counter seeds
+        # it without losing its own change
+        crud.seed_counter(db, crud.CUSTOMER_COUNTER, 99)
+        assert crud.get_customer_count(db) == 2
+        db.execute(models.CustomerCounter.__table__.delete())
+        crud._add_customer(
+            db,
+            schemas.CustomerCreate(
+                first_name="Cid", last_name="Smyth", date_of_birth="1991-07-07"
+            ),
+        )
+        db.commit()
+        assert crud.get_customer_count(db) == 3
+    finally:
+        db.close()
+
+
+def test_get_customers_approximate_count(client):
+    _create_customers(
+        client,
+        [("Ann", "Smith", "1990-05-01"), ("Bob", "Jones", "1985-01-01")],
+    )
+
+    # Without planner statistics the exact counter is used
+    response = client.get("/customers/?count=approximate")
+    assert response.headers["X-Total-Count"] == "2"
+    assert "X-Total-Count-Approximate" not in response.headers
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    _create_customers(client, [("Cid", "Smyth", "1991-07-07")])
+
+    # The estimate lags behind until statistics are refreshed
+    response = client.get("/customers/?count=approximate")
+    assert response.headers["X-Total-Count"] == "2"
+    assert response.headers["X-Total-Count-Approximate"] == "true"
+    assert client.get("/customers/count?approximate=true").json() == {"count": 2}
+    assert client.get("/customers/count").json() == {"count": 3}